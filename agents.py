@@ -0,0 +1,232 @@
+import numpy as np
+from items import MATERIALS, Animal, House, Lake, Pond, Road
+from occupancy import OccupancyIndex
+from view_cache import BlockOverlay
+
+ANIMAL = MATERIALS["Animal"]
+
+# Items the animals walk around, each with an optional filter on their constructor arguments: ponds
+# smaller than a block are the cells of the river strip, larger ones are the ponds the animals seek out
+OBSTACLES = ((House, None), (Road, None), (Lake, None), (Pond, lambda params: params["radius"] < 1))
+ATTRACTORS = ((Pond, lambda params: params["radius"] >= 1),)
+
+
+class SpatialHash:
+    def __init__(self, points, cell_size):
+        """
+        Points bucketed into square cells of cell_size blocks, to find the points near many queries at once.
+
+        The points are sorted by the key of their cell, so the points of any cell are one contiguous run,
+        found for all queries with one vectorized binary search per neighbouring cell.
+
+        Args:
+            points (np.ndarray): (N, 2) array of (x, y) positions, in blocks.
+            cell_size (float): Side of the cells, in blocks; about the query radius works best.
+        """
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.cell_size = cell_size
+        keys = self._keys(np.floor(self.points / cell_size).astype(np.int64))
+        self._order = np.argsort(keys, kind="stable")
+        # Distinct cells holding points, and where the run of points of each one starts and ends in _order
+        self._cells, self._starts, counts = np.unique(keys[self._order], return_index=True, return_counts=True)
+        self._ends = self._starts + counts
+
+    def __len__(self):
+        return len(self.points)
+
+    @staticmethod
+    def _keys(cells):
+        # Unique for any cell coordinates from -1 up to 2**31, so the cells around the map edges are valid too
+        return (cells[:, 0] << 32) + cells[:, 1]
+
+    def query(self, queries, radius):
+        """
+        Find the points within radius of each query position.
+
+        Returns:
+            tuple: (query index, point index, squared distance) arrays with one entry per pair found.
+        """
+        queries = np.asarray(queries, dtype=float).reshape(-1, 2)
+        cells = np.floor(queries / self.cell_size).astype(np.int64)
+        # Looking the queries up in the order of their cells keeps the binary searches cache friendly
+        by_cell = np.argsort(self._keys(cells), kind="stable")
+        cells = cells[by_cell]
+        reach = int(np.ceil(radius / self.cell_size))
+        query_index, point_index = [], []
+        for dx in range(-reach, reach + 1):
+            for dy in range(-reach, reach + 1):
+                keys = self._keys(cells + (dx, dy))
+                found = np.minimum(np.searchsorted(self._cells, keys), max(len(self._cells) - 1, 0))
+                hit = np.flatnonzero(self._cells[found] == keys) if len(self._cells) else found[:0]
+                counts = self._ends[found[hit]] - self._starts[found[hit]]
+                total = int(counts.sum())
+                if not total:
+                    continue
+                # Expand every query into the run of points of its cell
+                rank = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                query_index.append(np.repeat(by_cell[hit], counts))
+                point_index.append(self._order[np.repeat(self._starts[found[hit]], counts) + rank])
+        if not query_index:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        query_index, point_index = np.concatenate(query_index), np.concatenate(point_index)
+        distance2 = ((queries[query_index] - self.points[point_index]) ** 2).sum(axis=1)
+        near = distance2 <= radius ** 2
+        return query_index[near], point_index[near], distance2[near]
+
+    def nearest(self, queries, radius):
+        """
+        Return the index of the nearest point within radius of each query, or -1 where there is none.
+        """
+        query_index, point_index, distance2 = self.query(queries, radius)
+        nearest = np.full(len(np.asarray(queries).reshape(-1, 2)), -1, dtype=np.int64)
+        order = np.lexsort((distance2, query_index))
+        first = np.unique(query_index[order], return_index=True)[1]  # Closest point of each query
+        nearest[query_index[order][first]] = point_index[order][first]
+        return nearest
+
+
+def item_cells_index(simulation_map, selections):
+    """
+    Return an OccupancyIndex of the blocks covered by the footprints of the selected items of a map.
+
+    Args:
+        simulation_map (MapSimulation): The map.
+        selections (tuple): (item class, filter) pairs, with filters as for MapSimulation.find_items.
+    """
+    index = OccupancyIndex(simulation_map.height, simulation_map.width, simulation_map.sparse)
+    for item_type, where in selections:
+        x, y, params = simulation_map.find_items(item_type, where)
+        if len(x):
+            _, cx, cy = index.item_cells(item_type.__name__, x, y, params)
+            index.mark(cx, cy)
+    return index
+
+def item_centers(simulation_map, selections):
+    """Return the (N, 2) block centers of the selected items of a map, with selections as for item_cells_index."""
+    centers = [np.stack(simulation_map.find_items(item_type, where)[:2], axis=1) + 0.5
+               for item_type, where in selections]
+    return np.concatenate(centers) if centers else np.empty((0, 2))
+
+
+class AnimalAgents:
+    def __init__(self, simulation_map, positions, seed=None, speed=2.0, attraction=0.5, attraction_radius=16.0,
+                 separation=0.5, separation_radius=1.0, obstacles=None, attractors=None):
+        """
+        Animals that move over a map every timestep, all at once, as arrays of positions.
+
+        Each step, every animal takes a random-walk step, biased towards the nearest pond within
+        attraction_radius and away from the other animals within separation_radius, and does not enter
+        blocks covered by houses, roads, lakes or the river (it slides along them, or waits). Ponds and
+        neighbours are found through spatial hashes and obstacles through an occupancy index, so a step
+        has no per-animal Python loop.
+
+        The animals are drawn over the map's views like Animal items, through a BlockOverlay: they add
+        their conductivity to the blocks they are in and are the top item there. They are not part of the
+        map's layers, so editing a block never loses them and saving the map leaves them out. After a step
+        only the blocks that animals left or entered are marked, and the cached views patched there.
+
+        Args:
+            simulation_map (MapSimulation): The map the animals live on.
+            positions (array-like): (N, 2) starting (x, y) positions, in blocks; integer positions are taken
+                as the centers of those blocks.
+            seed (int): Seed of the random walk.
+            speed (float): Length of the random-walk step per hour, in blocks.
+            attraction (float): Weight of the pull towards the nearest pond, relative to the random walk.
+            attraction_radius (float): Distance, in blocks, from which ponds attract animals.
+            separation (float): Weight of the push away from nearby animals.
+            separation_radius (float): Distance, in blocks, under which animals push each other away.
+            obstacles (OccupancyIndex): Blocks the animals cannot enter (default are the footprints of the
+                OBSTACLES of the map).
+            attractors (np.ndarray): (M, 2) positions the animals are drawn to (default are the centers of
+                the ATTRACTORS of the map).
+        """
+        self.map = simulation_map
+        positions = np.asarray(positions)
+        self.positions = positions.reshape(-1, 2).astype(float) + (0.5 if positions.dtype.kind in "iu" else 0.0)
+        self.rng = np.random.default_rng(seed)
+        self.speed = speed
+        self.attraction = attraction
+        self.attraction_radius = attraction_radius
+        self.separation = separation
+        self.separation_radius = separation_radius
+        self.obstacles = item_cells_index(simulation_map, OBSTACLES) if obstacles is None else obstacles
+        attractors = item_centers(simulation_map, ATTRACTORS) if attractors is None else attractors
+        self.attractors = SpatialHash(attractors, attraction_radius)
+
+        # The blocks holding animals and their number of animals, drawn over the map's views
+        self.overlay = BlockOverlay(ANIMAL.color, ANIMAL.thermal_conductivity)
+        self.overlay.keys, self.overlay.counts = self._occupied()
+        simulation_map.views.add_overlay(self.overlay)
+
+    @classmethod
+    def from_map(cls, simulation_map, **kwargs):
+        """Take the Animal items off a map and return agents starting where they stood."""
+        return cls(simulation_map, simulation_map.remove_items(Animal), **kwargs)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def cells(self):
+        """Return the (x, y) blocks of the animals, as integer arrays."""
+        cells = np.floor(self.positions).astype(np.int64)
+        return cells[:, 0], cells[:, 1]
+
+    def _occupied(self):
+        """Return the sorted flat indices of the blocks holding animals, and their number of animals."""
+        x, y = self.cells()
+        return np.unique(x * self.map.width + y, return_counts=True)
+
+    def step(self, hours=1 / 12):
+        """Move every animal by one timestep of the given length, then update the blocks that changed."""
+        if not len(self.positions):
+            return
+        direction = self.rng.normal(size=self.positions.shape)  # Random walk
+
+        if self.attraction and len(self.attractors):
+            nearest = self.attractors.nearest(self.positions, self.attraction_radius)
+            seeking = nearest >= 0
+            pull = self.attractors.points[nearest[seeking]] - self.positions[seeking]
+            distance = np.linalg.norm(pull, axis=1, keepdims=True)
+            direction[seeking] += self.attraction * pull / np.maximum(distance, 1.0)  # Weaker once nearly there
+
+        if self.separation and len(self.positions) > 1:
+            neighbours = SpatialHash(self.positions, self.separation_radius)
+            first, second, _ = neighbours.query(self.positions, self.separation_radius)
+            pairs = first != second
+            first, second = first[pairs], second[pairs]
+            away = self.positions[first] - self.positions[second]
+            away /= np.maximum(np.linalg.norm(away, axis=1, keepdims=True), 1e-6)
+            push = np.stack([np.bincount(first, weights=away[:, axis], minlength=len(self.positions))
+                             for axis in range(2)], axis=1)
+            direction += self.separation * push
+
+        # Try the full step first, then sliding along either axis; animals that cannot move stay put
+        shape = np.array([self.map.height, self.map.width])
+        step = direction * (self.speed * hours)
+        moved = np.zeros(len(self.positions), dtype=bool)
+        for mask in ((1.0, 1.0), (1.0, 0.0), (0.0, 1.0)):
+            target = np.clip(self.positions + step * mask, 0, np.nextafter(shape, 0))
+            cells = np.floor(target).astype(np.int64)
+            free = ~moved & ~self.obstacles.is_occupied(cells[:, 0], cells[:, 1])
+            self.positions[free] = target[free]
+            moved |= free
+        self._update_overlay(*self._occupied())
+
+    def _update_overlay(self, keys, counts):
+        """Set the blocks holding animals to keys, counts and mark the blocks whose number of animals changed."""
+        all_keys = np.union1d(self.overlay.keys, keys)
+        before = np.zeros(len(all_keys), dtype=np.int64)
+        after = np.zeros(len(all_keys), dtype=np.int64)
+        before[np.searchsorted(all_keys, self.overlay.keys)] = self.overlay.counts
+        after[np.searchsorted(all_keys, keys)] = counts
+        changed = all_keys[before != after]
+        self.overlay.keys, self.overlay.counts = keys, counts
+        if len(changed):
+            self.map.views.mark(changed // self.map.width, changed % self.map.width)
+
+    def remove(self):
+        """Take the animals off the map's views, restoring the blocks they were in."""
+        self._update_overlay(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        self.positions = np.empty((0, 2))
+        if self.overlay in self.map.views.overlays:
+            self.map.views.remove_overlay(self.overlay)
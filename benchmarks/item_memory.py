@@ -0,0 +1,67 @@
+"""
+Memory per placed item: item objects with a per-instance __dict__, the __slots__ items sharing their
+type's material, and the columnar storage of add_items, whose Item objects are only created on demand.
+Positions are excluded from the object sizes (they are shared tuples here).
+
+    python benchmarks/item_memory.py --items 1000000
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from items import Tree  # noqa: E402
+from map_simulation import MapSimulation  # noqa: E402
+
+
+class DictTree:
+    # Reference layout of an item before __slots__: every attribute in the instance __dict__
+    def __init__(self, position, radius=0.25):
+        self.position = position
+        self.name = "Tree"
+        self.color = (0, 100, 0)
+        self.thermal_conductivity = 1.0
+        self.radius = radius
+
+
+def traced_bytes(build):
+    """Return the result of build() and the memory it still holds afterwards, in bytes."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the memory taken per placed item.")
+    parser.add_argument("--items", type=int, default=1_000_000, help="Number of trees to place")
+    args = parser.parse_args(argv)
+
+    side = int(np.ceil(np.sqrt(args.items)))
+    positions = np.stack(np.divmod(np.arange(args.items), side), axis=1)  # One tree per block
+    position_tuples = [tuple(position) for position in positions.tolist()]
+
+    rows = []
+    objects, size = traced_bytes(lambda: [DictTree(position, radius=0.38) for position in position_tuples])
+    rows.append(("Item objects with __dict__", size))
+    del objects
+    objects, size = traced_bytes(lambda: [Tree(position, radius=0.38) for position in position_tuples])
+    rows.append(("__slots__ items, shared material", size))
+    del objects, position_tuples
+
+    simulation_map = MapSimulation(side, side)
+    _, size = traced_bytes(lambda: simulation_map.add_items(positions, Tree, on_collision="ignore", radius=0.38))
+    rows.append(("add_items columns (not created)", size))
+
+    print(f"{args.items:,} trees")
+    print(f"{'storage':<36}{'MB':>10}{'bytes/item':>12}{'vs __dict__':>13}")
+    for label, size in rows:
+        print(f"{label:<36}{size / 1e6:>10.1f}{size / args.items:>12.1f}{rows[0][1] / size:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Benchmark suite for view generation, plotting and the full day cycle, run headless with the Agg backend.
+
+Each benchmark runs on procedurally generated maps of the requested sizes and item density, and records the
+median and best time of a few repeats plus the peak memory measured with tracemalloc (in a separate run, as
+tracing slows Python code down). Results are written as JSON and can be compared against a stored baseline:
+
+    python benchmarks/suite.py --output baseline.json
+    python benchmarks/suite.py --baseline baseline.json --threshold 0.25
+
+The comparison exits with status 1 when a benchmark got slower than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import cano  # noqa: E402
+from items import Animal, House, Pond, Road, Tree  # noqa: E402
+from map_simulation import MapSimulation  # noqa: E402
+from visuals import plot_map_rgb, plot_map_thermal  # noqa: E402
+
+# Share of each item type among the placed items, with the parameters they are placed with
+MIX = ((Tree, 0.6, {"radius": 0.38}), (House, 0.1, {"width": 3, "length": 2}), (Road, 0.15, {"width": 1}),
+       (Pond, 0.05, {"radius": 1}), (Animal, 0.1, {}))
+
+DEFAULT_SIZES = "50x36,256x256,1024x1024,4096x4096"
+CHAIN_ITEMS = 100_000  # Largest number of items in the overlap chain benchmark
+
+def make_map(width, height, density, seed=0, sparse=None):
+    """
+    Build a random map with about density items per block, mixed as in MIX.
+
+    Maps of more than a million blocks are sparse unless sparse says otherwise.
+    """
+    if sparse is None:
+        sparse = width * height > 1 << 20
+    simulation_map = MapSimulation(width, height, sparse=sparse)
+    rng = np.random.default_rng(seed)
+    n_items = int(round(density * width * height))
+    for item_type, share, params in MIX:
+        positions = np.stack([rng.integers(0, height, int(n_items * share)),
+                              rng.integers(0, width, int(n_items * share))], axis=1)
+        simulation_map.add_items(positions, item_type, on_collision="ignore", **params)
+    return simulation_map
+
+def time_call(function, repeat, setup=None, min_seconds=0.05):
+    """
+    Return the wall time per call of function in each of repeat runs, calling setup (untimed) before each call.
+
+    Fast functions are called several times per run, so that every run lasts at least about min_seconds.
+    """
+    start = time.perf_counter()
+    if setup is not None:
+        setup()
+    function()
+    number = int(min(max(min_seconds / max(time.perf_counter() - start, 1e-9), 1), 1000))
+    times = []
+    for _ in range(repeat):
+        total = 0.0
+        for _ in range(number):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            function()
+            total += time.perf_counter() - start
+        times.append(total / number)
+    return times
+
+def peak_memory(function, setup=None):
+    """Return the peak memory allocated while function runs, in bytes."""
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def benchmarks(simulation_map, plots):
+    """Return the benchmarks of a map as (name, function, setup) tuples."""
+    temp = cano.get_hourly_temperature(12)
+    cold = simulation_map.views.clear  # Drops the cached views, so that they are computed from scratch
+    cases = [
+        ("generate_rgb_view", simulation_map.generate_rgb_view, cold),
+        ("generate_rgb_view (cached)", simulation_map.generate_rgb_view, None),
+        ("generate_thermal_view", lambda: simulation_map.generate_thermal_view(temp), cold),
+        ("generate_thermal_view (cached)", lambda: simulation_map.generate_thermal_view(temp), None),
+        ("generate_thermal_views (24 h)",
+         lambda: simulation_map.generate_thermal_views(cano.get_hourly_temperature(np.arange(24))), cold),
+    ]
+
+    # Two-block roads on consecutive blocks: every row is one long chain of overlapping items, the worst case
+    # of the collision rounds of add_items
+    width, height = simulation_map.width, simulation_map.height
+    chain = np.stack(np.unravel_index(np.arange(min(width * height, CHAIN_ITEMS)), (height, width)), axis=1)
+    empty = {}
+
+    def new_map():
+        empty["map"] = MapSimulation(width, height, sparse=True)  # Sparse, so that setting up stays cheap
+    cases.append(("add_items (overlap chains)", lambda: empty["map"].add_items(chain, Road, width=2), new_map))
+    if plots:
+        def plot_rgb():
+            plot_map_rgb(simulation_map.generate_rgb_view(), simulation_map.blocks, 12)
+            plt.close("all")
+
+        def plot_thermal():
+            plot_map_thermal(simulation_map.generate_thermal_view(temp), simulation_map.blocks, 12)
+            plt.close("all")
+
+        def full_day():
+            cano.simulate_full_day(simulation_map, pause=1e-3)
+            plt.close("all")
+        cases += [("plot_map_rgb", plot_rgb, None), ("plot_map_thermal", plot_thermal, None),
+                  ("simulate_full_day", full_day, None)]
+    return cases
+
+def run(sizes, density, repeat, plot_max_blocks, seed=0):
+    """Run every benchmark on every map size and return the result records."""
+    results = []
+    for width, height in sizes:
+        start = time.perf_counter()
+        simulation_map = make_map(width, height, density, seed)
+        build_seconds = time.perf_counter() - start
+        n_items = int(simulation_map.item_counts.sum() - width * height)
+        plots = width * height <= plot_max_blocks
+        print(f"{width}x{height}: {n_items:,} items, built in {build_seconds:.2f} s"
+              + ("" if plots else " (plots skipped)"), flush=True)
+        for name, function, setup in benchmarks(simulation_map, plots):
+            times = time_call(function, repeat, setup)
+            peak = peak_memory(function, setup)
+            results.append({"map": f"{width}x{height}", "items": n_items, "benchmark": name,
+                            "median_s": statistics.median(times), "min_s": min(times), "peak_bytes": peak})
+            print(f"  {name:<32}{statistics.median(times) * 1e3:>12.2f} ms{peak / 1e6:>10.1f} MB", flush=True)
+    return results
+
+def compare(results, baseline, threshold, noise_floor=1e-4):
+    """
+    Compare result records to baseline records of the same map and benchmark.
+
+    A benchmark regressed when it is slower than the baseline by more than the threshold ratio and by more
+    than noise_floor seconds, so that timer noise on microsecond benchmarks is not reported.
+
+    Returns:
+        list: (map, benchmark, baseline seconds, seconds, ratio, regressed) for every benchmark in both.
+    """
+    reference = {(record["map"], record["benchmark"]): record for record in baseline["results"]}
+    rows = []
+    for record in results:
+        base = reference.get((record["map"], record["benchmark"]))
+        if base is not None:
+            ratio = record["median_s"] / base["median_s"]
+            slower = record["median_s"] - base["median_s"]
+            rows.append((record["map"], record["benchmark"], base["median_s"], record["median_s"], ratio,
+                         ratio > 1 + threshold and slower > noise_floor))
+    return rows
+
+def parse_sizes(text):
+    """Parse "WxH,WxH,..." into a list of (width, height) pairs."""
+    return [tuple(int(value) for value in size.lower().split("x")) for size in text.split(",")]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark view generation, plotting and the full day cycle.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Map sizes as WxH,WxH,... (default: {DEFAULT_SIZES})")
+    parser.add_argument("--density", type=float, default=0.05, help="Items per block (default: 0.05)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per benchmark (default: 3)")
+    parser.add_argument("--plot-max-blocks", type=int, default=256 * 256,
+                        help="Largest map, in blocks, on which the plotting benchmarks run (default: 65536)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated maps")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare the results to this JSON file of an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Slowdown over the baseline counted as a regression (default: 0.25, i.e. 25%%)")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore", message=".*non-interactive.*")  # plt.show() under Agg
+    results = run(parse_sizes(args.sizes), args.density, args.repeat, args.plot_max_blocks, args.seed)
+    report = {"python": platform.python_version(), "numpy": np.__version__, "matplotlib": matplotlib.__version__,
+              "machine": platform.platform(), "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+              "density": args.density, "repeat": args.repeat, "results": results}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(results, json.load(f), args.threshold)
+        print(f"\n{'map':<12}{'benchmark':<34}{'baseline ms':>12}{'ms':>12}{'ratio':>8}")
+        for map_name, name, base, seconds, ratio, regressed in rows:
+            print(f"{map_name:<12}{name:<34}{base * 1e3:>12.2f}{seconds * 1e3:>12.2f}{ratio:>8.2f}"
+                  + ("  REGRESSION" if regressed else ""))
+        regressions = sum(row[-1] for row in rows)
+        print(f"{regressions} regression(s) above {args.threshold:.0%}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
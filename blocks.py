@@ -1,9 +1,12 @@
-from items import Item, House, Tree, Road, Pond, Lake, Animal  # Import the required item classes
+from items import MATERIALS, Item, House, Tree, Road, Pond, Lake, Animal  # Import the required item classes
+
+GRASS_COLOR = MATERIALS["Grass"].color  # Green color of the default grass item in every block
+GRASS_CONDUCTIVITY = MATERIALS["Grass"].thermal_conductivity  # Thermal conductivity of the default grass item
 
 class Block:
     def __init__(self, position):
         self.position = position
-        self.items = [Item(position, "Grass", (34, 139, 34))]  # Default item is Grass with a green color
+        self.items = [Item(position, "Grass", GRASS_COLOR, GRASS_CONDUCTIVITY)]  # Default item is Grass with a green color
 
     def add_item(self, item):
         """Add a new item to the block."""
@@ -34,3 +37,62 @@ class Block:
                 if isinstance(item, House) and "size" in kwargs:
                     item.set_size(*kwargs["size"])  # Update house size if provided
                 return  # Exit the loop after modifying the item
+
+
+class SparseBlockGrid:
+    def __init__(self, height, width):
+        """
+        Block grid that only stores the blocks that have been accessed; every other block is implied grass.
+
+        It is indexed like the dense list of lists, as grid[x][y]. A block is created and stored the first
+        time it is indexed. Iterating over a row yields the stored blocks and fresh, unstored grass blocks
+        for the rest.
+        """
+        self.height = height
+        self.width = width
+        self.cells = {}  # (x, y) -> Block
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, x):
+        if x < 0:
+            x += self.height
+        if not 0 <= x < self.height:
+            raise IndexError("block grid row index out of range")
+        return SparseBlockRow(self, x)
+
+    def __iter__(self):
+        for x in range(self.height):
+            yield SparseBlockRow(self, x)
+
+    def block(self, x, y):
+        """Return the block at (x, y), creating and storing it if needed."""
+        block = self.cells.get((x, y))
+        if block is None:
+            block = self.cells[(x, y)] = Block((x, y))
+        return block
+
+
+class SparseBlockRow:
+    __slots__ = ("grid", "x")
+
+    def __init__(self, grid, x):
+        """Lightweight view of row x of a SparseBlockGrid."""
+        self.grid = grid
+        self.x = x
+
+    def __len__(self):
+        return self.grid.width
+
+    def __getitem__(self, y):
+        if y < 0:
+            y += self.grid.width
+        if not 0 <= y < self.grid.width:
+            raise IndexError("block grid column index out of range")
+        return self.grid.block(self.x, y)
+
+    def __iter__(self):
+        for y in range(self.grid.width):
+            block = self.grid.cells.get((self.x, y))
+            yield block if block is not None else Block((self.x, y))
@@ -0,0 +1,153 @@
+"""
+Write a dataset of paired RGB/thermal frames of procedurally generated scenes over the day cycle.
+
+Scenes are generated with procedural.generate_map and rendered with MapRasterizer, in a pool of worker
+processes that each write whole shards. Every shard is a compressed .npz file of a fixed number of scenes, and
+index.json lists the shards with the scenes they hold:
+
+    python dataset.py dataset/ --scenes 1000 --size 64x48 --scale 4 --scenes-per-shard 32
+
+Scene i of a dataset with seed s is generate_map(width, height, seed=(s, i)), so any scene can be rebuilt
+from the index alone.
+"""
+import argparse
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import instrumentation
+from procedural import generate_map
+from raster import MapRasterizer
+from sensor import ThermalSensor
+
+INDEX_FILE = "index.json"
+
+def render_scene(simulation_map, hours, temps, scale=4, sensor=None, rng=None):
+    """
+    Render the paired views of a map at every hour.
+
+    Args:
+        sensor (ThermalSensor): Optional thermal camera model; its counts are added as "sensor".
+        rng (np.random.Generator): Source of the sensor's temporal noise (default is the sensor's own).
+
+    Returns:
+        dict: "rgb" and "thermal" (T, H*scale, W*scale, 3) uint8 images, "thermal_views" (T, H, W) float32
+            thermal values, and "labels", the (H, W) type id of the top item of every block.
+    """
+    rasterizer = MapRasterizer(simulation_map, scale)
+    thermal_views = simulation_map.generate_thermal_views(temps, dtype=np.float32)
+    rendered = {"rgb": rasterizer.rgb(hours), "thermal": rasterizer.thermal(thermal_views, hours),
+                "thermal_views": thermal_views, "labels": simulation_map.type_ids.astype(np.uint8)}
+    if sensor is not None:
+        rendered["sensor"] = sensor.capture(thermal_views, rng)  # The whole day in one batched pass
+    return rendered
+
+def _write_shard(directory, shard, scenes, seed, width, height, hours, temps, scale, sensor):
+    """Generate, render and write the scenes of one shard; return its index entry."""
+    # Every scene gets its own noise, whichever worker renders it
+    rendered = [render_scene(generate_map(width, height, seed=(seed, scene)), hours, temps, scale, sensor,
+                             np.random.default_rng((seed, scene))) for scene in scenes]
+    name = f"shard_{shard:05d}.npz"
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        np.savez_compressed(f, scenes=np.array(scenes), **{key: np.stack([views[key] for views in rendered])
+                                                            for key in rendered[0]})
+    return {"file": name, "scenes": [int(scene) for scene in scenes], "bytes": os.path.getsize(path)}
+
+def write_dataset(directory, n_scenes, width=50, height=36, hours=range(24), seed=0, scale=4, scenes_per_shard=16,
+                  workers=None, sensor=None):
+    """
+    Generate n_scenes scenes and write their paired RGB/thermal frames over the day cycle as shards.
+
+    Each shard holds scenes_per_shard scenes (the last one may hold fewer), with the arrays "scenes" (S,),
+    "rgb" and "thermal" (S, T, H*scale, W*scale, 3) uint8, "thermal_views" (S, T, H, W) float32 and "labels"
+    (S, H, W) uint8. With a sensor, "sensor" holds its (S, T, rows, cols) uint16 counts too. index.json records
+    the shards, the hours and temperatures of the frames and the sizes.
+
+    Args:
+        directory (str): Output directory, created if needed.
+        n_scenes (int): Number of scenes.
+        width, height (int): Size of the maps in blocks.
+        hours (sequence): Hours of the day rendered for every scene.
+        seed (int): Seed of the dataset.
+        scale (int): Pixels along each side of a block in the images.
+        scenes_per_shard (int): Scenes per shard file.
+        workers (int): Number of worker processes (default is the number of CPUs).
+        sensor (ThermalSensor): Optional thermal camera model applied to the thermal views.
+
+    Returns:
+        dict: The throughput: "scenes", "frames" (paired frames, one per scene and hour), "seconds",
+            "scenes_per_second" and "frames_per_second".
+    """
+    from cano import get_hourly_temperature
+
+    os.makedirs(directory, exist_ok=True)
+    hours = np.asarray(hours, dtype=float)
+    temps = np.array([get_hourly_temperature(hour) for hour in hours])
+    shards = [list(range(start, min(start + scenes_per_shard, n_scenes)))
+              for start in range(0, n_scenes, scenes_per_shard)]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(shards)))
+
+    start = time.perf_counter()
+    with instrumentation.span("write_dataset", workers=workers, scenes=n_scenes), \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+        # One shard per task: a worker generates, renders, compresses and writes it without sending any frames back
+        entries = list(executor.map(_write_shard, [directory] * len(shards), range(len(shards)), shards,
+                                    [seed] * len(shards), [width] * len(shards), [height] * len(shards),
+                                    [hours] * len(shards), [temps] * len(shards), [scale] * len(shards),
+                                    [sensor] * len(shards)))
+    seconds = time.perf_counter() - start
+
+    index = {"version": 1, "seed": seed, "width": width, "height": height, "scale": scale,
+             "hours": hours.tolist(), "temperatures": temps.tolist(), "scenes": n_scenes,
+             "frames": n_scenes * len(hours), "shards": entries}
+    if sensor is not None:
+        index["sensor"] = {"resolution": list(sensor.resolution or (height, width)), "bits": sensor.bits,
+                           "value_range": list(sensor.value_range), "netd": sensor.netd, "seed": sensor.seed}
+    with open(os.path.join(directory, INDEX_FILE), "w") as f:
+        json.dump(index, f, indent=2)
+    return {"scenes": n_scenes, "frames": n_scenes * len(hours), "seconds": seconds,
+            "scenes_per_second": n_scenes / seconds, "frames_per_second": n_scenes * len(hours) / seconds}
+
+def load_scene(directory, scene):
+    """Return the arrays of one scene of a dataset, as in render_scene."""
+    with open(os.path.join(directory, INDEX_FILE)) as f:
+        index = json.load(f)
+    for entry in index["shards"]:
+        if scene in entry["scenes"]:
+            with np.load(os.path.join(directory, entry["file"])) as shard:
+                position = entry["scenes"].index(scene)
+                return {key: shard[key][position] for key in shard.files if key != "scenes"}
+    raise KeyError(f"Scene {scene} is not in the dataset.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write paired RGB/thermal frames of generated scenes as shards.")
+    parser.add_argument("output", help="Output directory")
+    parser.add_argument("--scenes", type=int, default=100, help="Number of scenes (default: 100)")
+    parser.add_argument("--size", default="50x36", help="Map size as WxH (default: 50x36)")
+    parser.add_argument("--step", type=float, default=1, help="Hours between frames (default: 1)")
+    parser.add_argument("--scale", type=int, default=4, help="Pixels per block side (default: 4)")
+    parser.add_argument("--scenes-per-shard", type=int, default=16, help="Scenes per shard (default: 16)")
+    parser.add_argument("--workers", type=int, default=None, help="Number of processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the dataset")
+    parser.add_argument("--sensor", metavar="WxH",
+                        help="Also store the counts of a thermal camera of this resolution (see sensor.py)")
+    args = parser.parse_args(argv)
+
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    hours = np.arange(0, 24, args.step)
+    sensor = None
+    if args.sensor:
+        sensor_width, sensor_height = (int(value) for value in args.sensor.lower().split("x"))
+        sensor = ThermalSensor(resolution=(sensor_height, sensor_width), seed=args.seed)
+    stats = write_dataset(args.output, args.scenes, width, height, hours, args.seed, args.scale,
+                          args.scenes_per_shard, args.workers, sensor)
+    print(f"{stats['scenes']} scenes, {stats['frames']} frames in {stats['seconds']:.2f} s: "
+          f"{stats['scenes_per_second']:.2f} scenes/s, {stats['frames_per_second']:.1f} frames/s "
+          f"({math.ceil(args.scenes / args.scenes_per_shard)} shards)")
+
+
+if __name__ == "__main__":
+    main()
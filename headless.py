@@ -0,0 +1,99 @@
+import math
+import os
+import shutil
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import instrumentation
+
+# Per-process rendering state, set up once by _init_worker in every worker process
+_simulation_map = None
+_renderer = None
+
+def _init_worker(simulation_map, dpi):
+    """Build the off-screen figure of the map once in a worker process."""
+    global _simulation_map, _renderer
+    # matplotlib is only ever imported here, in the workers
+    import matplotlib
+    matplotlib.use("Agg")
+    from visuals import MapRenderer
+
+    _simulation_map = simulation_map
+    _renderer = MapRenderer(simulation_map)
+    _renderer.fig.set_dpi(dpi)
+
+def _render_frame(hour, temp, path, thermal_view=None):
+    """Render one hour; save it as a PNG at path, or return it as an RGB array when path is None."""
+    if thermal_view is None:
+        thermal_view = _simulation_map.generate_thermal_view(temp)
+    _renderer.draw(hour, temp, thermal_view)
+    if path is not None:
+        _renderer.fig.savefig(path)
+        return path
+    _renderer.fig.canvas.draw()
+    return np.asarray(_renderer.fig.canvas.buffer_rgba())[..., :3].copy()
+
+def _write_gif(frames, output, fps):
+    """Assemble the rendered frames into an animated GIF."""
+    from PIL import Image
+
+    images = [Image.fromarray(frame) for frame in frames]
+    images[0].save(output, save_all=True, append_images=images[1:], duration=int(1000 / fps), loop=0)
+
+def _write_mp4(frames, output, fps):
+    """Encode the rendered frames into an MP4 video by piping raw RGB data to ffmpeg."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("Writing .mp4 animations requires ffmpeg on the PATH.")
+    height, width = frames[0].shape[:2]
+    command = [ffmpeg, "-y", "-loglevel", "error",
+               "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-",
+               "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",  # H.264 needs even frame sizes
+               "-pix_fmt", "yuv420p", output]
+    subprocess.run(command, input=np.stack(frames).tobytes(), check=True)
+
+def render_frames(simulation_map, output, hours, temps, workers=None, fps=2, dpi=100, thermal_views=None):
+    """
+    Render the RGB and thermal figure of each hour without a display, fanned out over a process pool.
+
+    Each worker builds the map's figure once and then renders a contiguous chunk of the hours.
+
+    Args:
+        simulation_map (MapSimulation): The map to render.
+        output (str): Directory for one PNG per frame, or a path ending in .gif or .mp4 for a single animation.
+        hours (sequence): Hour of the day of each frame.
+        temps (sequence): Temperature of each frame.
+        workers (int): Number of worker processes (default is the number of CPUs).
+        fps (float): Frames per second of .gif/.mp4 animations.
+        dpi (int): Resolution of the rendered figures.
+        thermal_views (np.ndarray): Optional (T, H, W) thermal views to draw, e.g. from the heat diffusion model.
+            By default each worker computes generate_thermal_view(temp) itself.
+
+    Returns:
+        list | str: The paths of the PNG frames, or the path of the animation.
+    """
+    hours, temps = list(hours), list(temps)
+    thermal_views = [None] * len(hours) if thermal_views is None else list(thermal_views)
+    animation = os.path.splitext(output)[1].lower()
+    if animation in (".gif", ".mp4"):
+        paths = [None] * len(hours)  # Frames come back to this process to be assembled
+    else:
+        os.makedirs(output, exist_ok=True)
+        paths = [os.path.join(output, f"frame_{index:04d}.png") for index in range(len(hours))]
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(hours)))
+    chunksize = math.ceil(len(hours) / workers)
+    # Spans inside the worker processes are not collected; the pool is timed as a whole
+    with instrumentation.span("render_frames", workers=workers, frames=len(hours)), \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(simulation_map, dpi)) as executor:
+        frames = list(executor.map(_render_frame, hours, temps, paths, thermal_views, chunksize=chunksize))
+
+    if animation == ".gif":
+        with instrumentation.span("encode", format="gif"):
+            _write_gif(frames, output, fps)
+    elif animation == ".mp4":
+        with instrumentation.span("encode", format="mp4"):
+            _write_mp4(frames, output, fps)
+    else:
+        return frames
+    return output
@@ -0,0 +1,218 @@
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+# Set to 1 to collect timings from the start, e.g. SIM_PROFILE=1 python cano.py (which writes them to profile/)
+ENV_VAR = "SIM_PROFILE"
+# Set to an hour of the day to also capture a cProfile profile of that hour
+PROFILE_HOUR_ENV_VAR = "SIM_PROFILE_HOUR"
+
+class _NullSpan:
+    # Shared span returned while collection is disabled, so a disabled span costs one attribute check
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("recorder", "name", "args", "start")
+
+    def __init__(self, recorder, name, args):
+        self.recorder = recorder
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter_ns() - self.start
+        recorder = self.recorder
+        recorder.events.append((self.name, self.start, duration, recorder.current_hour, threading.get_ident(),
+                                self.args))
+        return False
+
+
+def _plain(value):
+    """Convert numpy scalars to plain Python values for JSON."""
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+class Instrumentation:
+    def __init__(self, enabled=False, profile_hour=None):
+        """
+        Timing spans and counters around the phases of a simulation run.
+
+        Phases are wrapped in span(name), and work such as the items drawn is tallied with count(name, n).
+        Both are attributed to the hour entered with hour(h), so a run can be broken down per hour with
+        summary_table, or inspected as a timeline with write_trace (open it in chrome://tracing or Perfetto).
+        While disabled, span returns a shared no-op context manager and count returns immediately.
+
+        Args:
+            enabled (bool): Whether to collect from the start.
+            profile_hour (int): Hour of the day to capture with cProfile as well (see write_profile).
+        """
+        self.enabled = enabled
+        self.profile_hour = profile_hour
+        self.reset()
+
+    def reset(self):
+        """Drop everything collected so far."""
+        self.events = []  # (name, start ns, duration ns, hour, thread id, args) of every finished span
+        self.counters = {}  # (hour, name) -> total
+        self.current_hour = None  # None outside any hour, e.g. while the figure is set up
+        self.profile = None  # cProfile.Profile of profile_hour, once that hour has run
+        self._origin = time.perf_counter_ns()
+
+    def enable(self, profile_hour=None):
+        """Start collecting; with profile_hour, also capture that hour with cProfile."""
+        self.enabled = True
+        if profile_hour is not None:
+            self.profile_hour = profile_hour
+
+    def disable(self):
+        """Stop collecting; what was collected is kept until reset."""
+        self.enabled = False
+
+    def span(self, name, **args):
+        """Return a context manager timing the enclosed block as the phase name; args go to the trace."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name, value=1):
+        """Add value to the counter name of the current hour."""
+        if self.enabled:
+            key = (self.current_hour, name)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def hour(self, hour):
+        """Attribute the spans and counters of the enclosed block to an hour, itself timed as the span "hour"."""
+        if not self.enabled:
+            yield
+            return
+        hour = hour.item() if hasattr(hour, "item") else hour  # NumPy hours compare and print as plain numbers
+        previous, self.current_hour = self.current_hour, hour
+        profile = cProfile.Profile() if self.profile_hour is not None and hour == self.profile_hour else None
+        try:
+            with self.span("hour"):
+                if profile is not None:
+                    profile.enable()
+                try:
+                    yield
+                finally:
+                    if profile is not None:
+                        profile.disable()
+                        self.profile = profile
+        finally:
+            self.current_hour = previous
+
+    def summary(self):
+        """
+        Return the total time of each span and the total of each counter, per hour.
+
+        Returns:
+            dict: Hour (None for the work outside any hour) -> {span name: seconds, counter name: total},
+                with the hours and names in the order they were first seen.
+        """
+        rows = {None: {}}
+        for name, _, duration, hour, _, _ in self.events:
+            row = rows.setdefault(hour, {})
+            row[name] = row.get(name, 0) + duration / 1e9
+        for (hour, name), value in self.counters.items():
+            rows.setdefault(hour, {})[name] = value
+        if not rows[None]:
+            del rows[None]
+        return rows
+
+    def summary_table(self):
+        """Return the summary as a text table: one row per hour, span times in ms and counter totals."""
+        rows = self.summary()
+        spans = list(dict.fromkeys(event[0] for event in sorted(self.events, key=lambda event: event[1])))
+        counters = list(dict.fromkeys(name for _, name in self.counters))
+        names = [name for name in spans if name != "hour"] + (["hour"] if "hour" in spans else [])
+        widths = [max(len(name), 10) + 2 for name in names + counters]
+        lines = [f"{'hour':<8}" + "".join(f"{name:>{width}}" for name, width in zip(names + counters, widths))]
+        totals = {}
+        for hour, row in rows.items():
+            cells = []
+            for name, width in zip(names + counters, widths):
+                value = row.get(name)
+                totals[name] = totals.get(name, 0) + (value or 0)
+                if value is None:
+                    cells.append(f"{'':>{width}}")
+                elif name in counters:
+                    cells.append(f"{value:>{width},}")
+                else:
+                    cells.append(f"{value * 1e3:>{width}.2f}")
+            lines.append(f"{'setup' if hour is None else hour:<8}" + "".join(cells))
+        lines.append(f"{'total':<8}" + "".join(
+            f"{totals.get(name, 0):>{width},}" if name in counters else f"{totals.get(name, 0) * 1e3:>{width}.2f}"
+            for name, width in zip(names + counters, widths)))
+        return "\n".join(lines)
+
+    def write_trace(self, path):
+        """
+        Write the spans as a Chrome trace (JSON trace event format) timeline, with the counters of each hour.
+
+        Open it in chrome://tracing or https://ui.perfetto.dev.
+        """
+        pid = os.getpid()
+        events = []
+        for name, start, duration, hour, thread, args in self.events:
+            events.append({"name": name, "cat": "simulation", "ph": "X", "pid": pid, "tid": thread,
+                           "ts": (start - self._origin) / 1e3, "dur": duration / 1e3,
+                           "args": dict(args, hour=hour)})
+            if name == "hour":
+                counters = {counter: value for (counter_hour, counter), value in self.counters.items()
+                            if counter_hour == hour}
+                if counters:
+                    events.append({"name": "counters", "ph": "C", "pid": pid, "tid": thread,
+                                   "ts": (start - self._origin) / 1e3, "args": counters})
+        setup = {counter: value for (counter_hour, counter), value in self.counters.items() if counter_hour is None}
+        if setup:  # Counted outside any hour, shown at the start of the timeline
+            events.append({"name": "counters", "ph": "C", "pid": pid, "tid": threading.get_ident(), "ts": 0,
+                           "args": setup})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=_plain)
+
+    def profile_stats(self):
+        """Return the pstats.Stats of the profiled hour."""
+        if self.profile is None:
+            raise RuntimeError("No hour was profiled; enable the instrumentation with profile_hour set first.")
+        return pstats.Stats(self.profile)
+
+    def write_profile(self, path):
+        """Write the cProfile data of the profiled hour, for pstats or snakeviz."""
+        self.profile_stats().dump_stats(path)
+
+
+def _profile_hour_from_env():
+    value = os.environ.get(PROFILE_HOUR_ENV_VAR)
+    return int(value) if value else None
+
+# The instrumentation used by the simulation, enabled by the SIM_PROFILE environment variable
+INSTRUMENTATION = Instrumentation(enabled=os.environ.get(ENV_VAR, "0") not in ("", "0"),
+                                  profile_hour=_profile_hour_from_env())
+
+span = INSTRUMENTATION.span
+count = INSTRUMENTATION.count
+hour = INSTRUMENTATION.hour
+enable = INSTRUMENTATION.enable
+disable = INSTRUMENTATION.disable
+reset = INSTRUMENTATION.reset
+summary = INSTRUMENTATION.summary
+summary_table = INSTRUMENTATION.summary_table
+write_trace = INSTRUMENTATION.write_trace
+write_profile = INSTRUMENTATION.write_profile
@@ -1,8 +1,67 @@
+import inspect
+
+# Integer ids for the item types, used by the array-backed layers of the map
+ITEM_TYPE_IDS = {"Grass": 0, "Tree": 1, "House": 2, "Road": 3, "Pond": 4, "Lake": 5, "Animal": 6}
+
+
+def get_item_type_id(name):
+    """Returns the integer id of an item type, registering unknown names on first use."""
+    return ITEM_TYPE_IDS.setdefault(name, len(ITEM_TYPE_IDS))
+
+
+class Material:
+    __slots__ = ("name", "color", "thermal_color", "thermal_conductivity", "shared")
+
+    def __init__(self, name, color, thermal_color=None, thermal_conductivity=1.0, shared=False):
+        """
+        Properties shared by all items of a type.
+
+        Args:
+            name (str): Name of the item type.
+            color (tuple): RGB color of the items in the RGB view and the map layers.
+            thermal_color (tuple): RGB color of the items drawn on the thermal view (None if they are not drawn).
+            thermal_conductivity (float): The thermal conductivity value.
+            shared (bool): Whether several items use this material, so that changing one item copies it first.
+        """
+        self.name = name
+        self.color = color
+        self.thermal_color = thermal_color
+        self.thermal_conductivity = thermal_conductivity
+        self.shared = shared
+
+    def copy(self, shared=False):
+        """Returns a copy that can be changed without affecting the items sharing this material."""
+        return Material(self.name, self.color, self.thermal_color, self.thermal_conductivity, shared)
+
+
+# Shared material of every item type; each item refers to the entry of its type unless it overrides a property
+MATERIALS = {
+    "Grass": Material("Grass", (34, 139, 34), shared=True),
+    "Tree": Material("Tree", (0, 100, 0), thermal_color=(255, 165, 0), shared=True),  # Dark green, orange when hot
+    "House": Material("House", (139, 69, 19), thermal_color=(255, 255, 0), shared=True),  # Brown, yellow when hot
+    "Road": Material("Road", (128, 128, 128), thermal_color=(128, 128, 128), shared=True),  # Gray
+    "Pond": Material("Pond", (0, 0, 255), thermal_color=(0, 0, 255), shared=True),  # Blue
+    "Lake": Material("Lake", (0, 0, 255), shared=True),  # Blue
+    "Animal": Material("Animal", (255, 0, 0), thermal_color=(255, 0, 0), shared=True),  # Red
+}
+
+
 class Item:
+    __slots__ = ("position", "_material")
+
+    # Material properties used by the heat diffusion model (thermal.py); the base values are those of grass
+    heat_capacity = 2.5e5  # Areal heat capacity of the surface layer, J/(m^2 K)
+    heat_conductivity = 0.1  # Lateral conductance of the surface layer between neighbouring blocks, W/K
+    solar_absorption = 0.77  # Fraction of the incoming sunlight that is absorbed
+
     def __init__(self, position, name, color, thermal_conductivity=1.0):
         """
         Base class for all items in the map simulation.
 
+        Items only store their position and geometry. Their name, color and thermal conductivity come from
+        the shared material of their type in MATERIALS, and an item gets a material of its own only when one
+        of these differs from its type's (overrides are the exception).
+
         Args:
             position (tuple): (x, y) coordinates of the item.
             name (str): Name of the item.
@@ -10,9 +69,39 @@ class Item:
             thermal_conductivity (float): The thermal conductivity value (default is 1.0).
         """
         self.position = position
-        self.name = name
-        self.color = color
-        self.thermal_conductivity = thermal_conductivity
+        material = MATERIALS.get(name)
+        if material is None or material.color != color or material.thermal_conductivity != thermal_conductivity:
+            material = Material(name, color, material.thermal_color if material else None, thermal_conductivity)
+        self._material = material
+
+    def _own_material(self):
+        """Returns the material of this item, copying the shared one first so that changes only affect it."""
+        if self._material.shared:
+            self._material = self._material.copy()
+        return self._material
+
+    @property
+    def name(self):
+        """Name of the item."""
+        return self._material.name
+
+    @property
+    def color(self):
+        """RGB color of the item."""
+        return self._material.color
+
+    @color.setter
+    def color(self, new_color):
+        self._own_material().color = new_color
+
+    @property
+    def thermal_conductivity(self):
+        """The thermal conductivity value of the item."""
+        return self._material.thermal_conductivity
+
+    @thermal_conductivity.setter
+    def thermal_conductivity(self, new_conductivity):
+        self._own_material().thermal_conductivity = new_conductivity
 
     def get_rgb(self):
         """Returns the RGB color of the item."""
@@ -36,6 +125,13 @@ class Item:
 
 
 class Tree(Item):
+    __slots__ = ("radius",)
+
+    # Canopy: little mass to heat, absorbs most light
+    heat_capacity = 1.5e5
+    heat_conductivity = 0.05
+    solar_absorption = 0.8
+
     def __init__(self, position, radius=0.25):
         """
         A class representing a tree in the simulation.
@@ -53,6 +149,13 @@ class Tree(Item):
 
 
 class House(Item):
+    __slots__ = ("width", "length")
+
+    # Brick and concrete
+    heat_capacity = 3.0e5
+    heat_conductivity = 0.5
+    solar_absorption = 0.7
+
     def __init__(self, position, width=3, length=2):
         """
         A class representing a house in the simulation.
@@ -73,6 +176,13 @@ class House(Item):
 
 
 class Road(Item):
+    __slots__ = ("width",)
+
+    # Dark asphalt: stores heat and absorbs almost all light
+    heat_capacity = 4.0e5
+    heat_conductivity = 0.3
+    solar_absorption = 0.92
+
     def __init__(self, position, width=1):
         """
         A class representing a road in the simulation.
@@ -90,6 +200,13 @@ class Road(Item):
 
 
 class Pond(Item):
+    __slots__ = ("radius",)
+
+    # About a meter of mixing water: heats and cools slowly
+    heat_capacity = 4.2e6
+    heat_conductivity = 60.0
+    solar_absorption = 0.93
+
     def __init__(self, position, radius=1):
         """
         A class representing a pond in the simulation.
@@ -107,6 +224,13 @@ class Pond(Item):
 
 
 class Lake(Item):
+    __slots__ = ()
+
+    # About a meter of mixing water: heats and cools slowly
+    heat_capacity = 4.2e6
+    heat_conductivity = 60.0
+    solar_absorption = 0.93
+
     def __init__(self, position):
         """
         A class representing a lake in the simulation.
@@ -120,6 +244,13 @@ class Lake(Item):
 
 
 class Animal(Item):
+    __slots__ = ()
+
+    # Fur insulates the body from its surroundings
+    heat_capacity = 2.0e5
+    heat_conductivity = 0.05
+    solar_absorption = 0.7
+
     def __init__(self, position):
         """
         A class representing an animal in the simulation.
@@ -130,3 +261,16 @@ class Animal(Item):
         super().__init__(position, "Animal", (255, 0, 0))  # Red color for animals
 
 
+
+
+# Item classes by name, used to rebuild items from saved scenes
+ITEM_CLASSES = {cls.__name__: cls for cls in (Tree, House, Road, Pond, Lake, Animal)}
+
+# Attributes that items of a type share unless they are changed on a single item
+MATERIAL_ATTRIBUTES = ("thermal_conductivity", "color")
+
+
+def constructor_defaults(item_type):
+    """Returns the optional constructor arguments of an item class and their defaults, e.g. {"radius": 0.25} for Tree."""
+    return {name: parameter.default for name, parameter in inspect.signature(item_type.__init__).parameters.items()
+            if parameter.default is not inspect.Parameter.empty}
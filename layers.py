@@ -0,0 +1,184 @@
+import numpy as np
+from blocks import GRASS_COLOR, GRASS_CONDUCTIVITY
+
+# Per-block layers of the map: (dtype, trailing shape, value of a block that only holds grass)
+LAYERS = {
+    "type_ids": (np.int16, (), 0),  # Type id of the top item
+    "top_colors": (np.uint8, (3,), GRASS_COLOR),  # RGB color of the top item
+    "conductivity_sum": (np.float64, (), GRASS_CONDUCTIVITY),  # Summed conductivity of all items
+    "item_counts": (np.int32, (), 1),  # Number of items in the block
+}
+
+
+class DenseLayers:
+    def __init__(self, height, width, arrays=None):
+        """
+        Structure-of-arrays layers holding a value for every block of the map.
+
+        arrays optionally provides the layers, as returned by to_arrays (e.g. memory-mapped from a scene file).
+        """
+        self.shape = (height, width)
+        if arrays is not None:
+            self.arrays = {name: arrays[name] for name in LAYERS}
+            return
+        self.arrays = {}
+        for name, (dtype, trailing, default) in LAYERS.items():
+            self.arrays[name] = np.empty(self.shape + trailing, dtype=dtype)
+            self.arrays[name][:] = default
+
+    def to_arrays(self):
+        """Return the arrays that fully describe the layers, to be saved and passed back as arrays."""
+        return dict(self.arrays)
+
+    def set_block(self, x, y, **values):
+        """Set the layer values of the block at (x, y)."""
+        for name, value in values.items():
+            self.arrays[name][x, y] = value
+
+    def set_blocks(self, x, y, **values):
+        """Set the layer values of many blocks at once; x and y are coordinate arrays."""
+        for name, value in values.items():
+            self.arrays[name][x, y] = value
+
+    def values(self, name, x, y):
+        """Return the layer values of the blocks at the coordinate arrays x, y."""
+        return self.arrays[name][x, y]
+
+    def layer(self, name, copy=False):
+        """Return a layer as a full (height, width) array, or a copy of it that the caller may keep."""
+        return self.arrays[name].copy() if copy else self.arrays[name]
+
+    def occupied(self, viewport=None):
+        """
+        Return the (x, y) coordinate arrays of the blocks holding more than grass.
+
+        With a viewport (x0, y0, x1, y1), only the blocks with x0 <= x < x1 and y0 <= y < y1 are scanned.
+        """
+        if viewport is None:
+            return np.nonzero(self.arrays["item_counts"] > 1)
+        x0, y0, x1, y1 = viewport
+        x, y = np.nonzero(self.arrays["item_counts"][x0:x1, y0:y1] > 1)
+        return x + x0, y + y0
+
+
+class SparseLayers:
+    def __init__(self, height, width, arrays=None):
+        """
+        Structure-of-arrays layers that only store the blocks with non-default contents.
+
+        Stored blocks get a slot in compact per-layer arrays, which grow by doubling. Full layers are built
+        by filling the grass value and scattering the stored slots, so untouched blocks cost no memory.
+        arrays optionally provides the stored blocks, as returned by to_arrays; their slot dict is then only
+        built when a block is looked up, so the full layers can be built straight from the arrays.
+        """
+        self.shape = (height, width)
+        if arrays is not None:
+            self.x, self.y = arrays["x"], arrays["y"]
+            self.arrays = {name: arrays[name] for name in LAYERS}
+            self.count = len(self.x)
+            self._slots = None
+            return
+        self.count = 0  # Number of stored blocks
+        self._slots = {}  # (x, y) -> slot in the compact arrays
+        self.x = np.empty(16, dtype=np.int64)
+        self.y = np.empty(16, dtype=np.int64)
+        self.arrays = {name: np.empty((16,) + trailing, dtype=dtype) for name, (dtype, trailing, _) in LAYERS.items()}
+
+    @property
+    def slots(self):
+        """Dict of (x, y) -> slot in the compact arrays of the stored blocks."""
+        if self._slots is None:
+            self._slots = dict(zip(zip(self.x[:self.count].tolist(), self.y[:self.count].tolist()), range(self.count)))
+        return self._slots
+
+    def to_arrays(self):
+        """Return the arrays that fully describe the stored blocks, to be saved and passed back as arrays."""
+        n = self.count
+        arrays = {name: array[:n] for name, array in self.arrays.items()}
+        arrays.update(x=self.x[:n], y=self.y[:n])
+        return arrays
+
+    def _grow(self):
+        """Double the capacity of the compact arrays."""
+        def grown(array):
+            bigger = np.empty((max(2 * len(array), 16),) + array.shape[1:], dtype=array.dtype)
+            bigger[:len(array)] = array
+            return bigger
+        self.x, self.y = grown(self.x), grown(self.y)
+        self.arrays = {name: grown(array) for name, array in self.arrays.items()}
+
+    def set_block(self, x, y, **values):
+        """Set the layer values of the block at (x, y), giving it a slot if it has none yet."""
+        slot = self.slots.get((x, y))
+        if slot is None:
+            slot = self.count
+            if slot >= len(self.x):
+                self._grow()
+            self.slots[(x, y)] = slot
+            self.count += 1
+            self.x[slot], self.y[slot] = x, y
+            for name, (_, _, default) in LAYERS.items():
+                self.arrays[name][slot] = default
+        for name, value in values.items():
+            self.arrays[name][slot] = value
+
+    def _lookup(self, x, y):
+        """Return the slots of the blocks at the coordinate arrays x, y, or -1 for blocks that are not stored."""
+        return np.fromiter((self.slots.get(key, -1) for key in zip(x.tolist(), y.tolist())), dtype=np.int64, count=len(x))
+
+    def set_blocks(self, x, y, **values):
+        """Set the layer values of many distinct blocks at once, giving slots to the ones that have none."""
+        x, y = np.asarray(x), np.asarray(y)
+        slots = self._lookup(x, y)
+        missing = np.nonzero(slots < 0)[0]
+        if len(missing):
+            first = self.count
+            while first + len(missing) > len(self.x):
+                self._grow()
+            new_slots = np.arange(first, first + len(missing))
+            self.slots.update(zip(zip(x[missing].tolist(), y[missing].tolist()), new_slots.tolist()))
+            self.count += len(missing)
+            self.x[new_slots], self.y[new_slots] = x[missing], y[missing]
+            for name, (_, _, default) in LAYERS.items():
+                self.arrays[name][new_slots] = default
+            slots[missing] = new_slots
+        for name, value in values.items():
+            self.arrays[name][slots] = value
+
+    def values(self, name, x, y):
+        """Return the layer values of the blocks at the coordinate arrays x, y (the grass value if not stored)."""
+        dtype, trailing, default = LAYERS[name]
+        slots = self._lookup(np.asarray(x), np.asarray(y))
+        out = np.empty((len(slots),) + trailing, dtype=dtype)
+        out[:] = default
+        out[slots >= 0] = self.arrays[name][slots[slots >= 0]]
+        return out
+
+    def layer(self, name, copy=False):
+        """
+        Return a layer as a full (height, width) array: the grass value with the stored blocks scattered in.
+
+        The array is built on every call, so it is always a copy.
+        """
+        dtype, trailing, default = LAYERS[name]
+        full = np.empty(self.shape + trailing, dtype=dtype)
+        full[:] = default
+        n = self.count
+        full[self.x[:n], self.y[:n]] = self.arrays[name][:n]
+        return full
+
+    def occupied(self, viewport=None):
+        """
+        Return the (x, y) coordinate arrays of the blocks holding more than grass, in row-major order.
+
+        With a viewport (x0, y0, x1, y1), only the blocks with x0 <= x < x1 and y0 <= y < y1 are returned.
+        """
+        n = self.count
+        stored = self.arrays["item_counts"][:n] > 1
+        if viewport is not None:
+            x0, y0, x1, y1 = viewport
+            x, y = self.x[:n], self.y[:n]
+            stored &= (x >= x0) & (x < x1) & (y >= y0) & (y < y1)
+        x, y = self.x[:n][stored], self.y[:n][stored]
+        order = np.lexsort((y, x))
+        return x[order], y[order]
@@ -0,0 +1,118 @@
+import numpy as np
+
+def _pool(array, dtype=None):
+    """Sum the 2x2 tiles over the first two axes of array, padding odd sizes with zeros."""
+    height, width = array.shape[:2]
+    if height % 2 or width % 2:
+        padded = np.zeros((height + height % 2, width + width % 2) + array.shape[2:], dtype=array.dtype)
+        padded[:height, :width] = array
+        array = padded
+    # Adding the four strided quarters is several times faster than summing a reshaped (h, 2, w, 2) view
+    pooled = array[0::2, 0::2].astype(dtype or array.dtype)
+    pooled += array[1::2, 0::2]
+    pooled += array[0::2, 1::2]
+    pooled += array[1::2, 1::2]
+    return pooled
+
+
+class LODPyramid:
+    def __init__(self, rgb, conductivity, type_ids, min_size=64):
+        """
+        Level-of-detail pyramid of a map: its views downsampled by 2x, 4x, 8x... for zoomed-out drawing.
+
+        Level k has one tile per 2**k x 2**k blocks, holding the mean color, the mean conductivity (the mean
+        thermal view at temperature t is t times it, as for single blocks) and the dominant type (the most
+        common top item type, ties going to the lowest type id) of the blocks of the tile. Tiles along an
+        odd edge cover fewer blocks and are averaged over those only. Level 0 is the map itself.
+
+        Levels are added until both sides fit in min_size tiles, so the pyramid takes about a third of the
+        memory of the views. A pyramid describes the map at the time it was built; MapSimulation.lod_pyramid
+        rebuilds it after edits.
+
+        Args:
+            rgb (np.ndarray): (height, width, 3) uint8 RGB view.
+            conductivity (np.ndarray): (height, width) mean conductivity of every block.
+            type_ids (np.ndarray): (height, width) type id of the top item of every block.
+            min_size (int): Largest side, in tiles, of the coarsest level.
+        """
+        self.shape = rgb.shape[:2]
+        self.min_size = min_size
+        self.levels = [{"rgb": rgb, "conductivity": conductivity, "types": type_ids}]
+
+        types = np.unique(type_ids)
+        cells = np.ones(self.shape, dtype=np.int32)  # Blocks covered by each tile
+        mean_rgb, mean_conductivity = rgb, conductivity
+        counts = [type_ids == type_id for type_id in types]  # Blocks of each type in each tile
+        while max(cells.shape) > min_size:
+            # Means of the next level are the means of the tiles weighted by the blocks they cover
+            if len(self.levels) > 1:  # Every block of level 0 covers itself only
+                mean_rgb, mean_conductivity = mean_rgb * cells[..., None], mean_conductivity * cells
+            next_cells = _pool(cells)
+            mean_rgb = _pool(mean_rgb, np.float64) / next_cells[..., None]
+            mean_conductivity = _pool(mean_conductivity, np.float64) / next_cells
+            counts = [_pool(count, np.int32) for count in counts]
+            cells = next_cells
+
+            # Dominant type: running argmax over the types, the first type winning ties
+            best = counts[0].copy()
+            dominant = np.full(cells.shape, types[0], dtype=type_ids.dtype)
+            for type_id, count in zip(types[1:], counts[1:]):
+                more = count > best
+                best[more] = count[more]
+                dominant[more] = type_id
+            self.levels.append({"rgb": np.rint(mean_rgb).astype(np.uint8), "conductivity": mean_conductivity,
+                                "types": dominant})
+
+    def __len__(self):
+        return len(self.levels)
+
+    def level_for(self, viewport=None, pixels=(1024, 1024)):
+        """
+        Return the coarsest level that still has at least one tile per screen pixel, or level 0.
+
+        Args:
+            viewport (tuple): The (x0, y0, x1, y1) blocks shown (default is the whole map).
+            pixels (tuple): The (rows, columns) of screen pixels they are drawn into.
+        """
+        x0, y0, x1, y1 = self._clip(viewport)
+        blocks_per_pixel = max((x1 - x0) / max(pixels[0], 1), (y1 - y0) / max(pixels[1], 1))
+        level = int(np.floor(np.log2(blocks_per_pixel))) if blocks_per_pixel >= 1 else 0
+        return min(level, len(self.levels) - 1)
+
+    def _clip(self, viewport):
+        """Return the viewport clipped to the map, the whole map for None."""
+        if viewport is None:
+            return 0, 0, self.shape[0], self.shape[1]
+        x0, y0, x1, y1 = viewport
+        return (max(int(np.floor(x0)), 0), max(int(np.floor(y0)), 0),
+                min(int(np.ceil(x1)), self.shape[0]), min(int(np.ceil(y1)), self.shape[1]))
+
+    def crop(self, level, viewport=None):
+        """
+        Return the tiles of a level covering a viewport.
+
+        Returns:
+            tuple: (rows, cols) slices of the level's arrays, and the (x0, y0, x1, y1) blocks those tiles
+                cover, which is the viewport widened to whole tiles.
+        """
+        x0, y0, x1, y1 = self._clip(viewport)
+        size = 2 ** level
+        rows, cols = slice(x0 // size, -(-x1 // size)), slice(y0 // size, -(-y1 // size))
+        window = (rows.start * size, cols.start * size, min(rows.stop * size, self.shape[0]),
+                  min(cols.stop * size, self.shape[1]))
+        return (rows, cols), window
+
+    def rgb(self, level=0, viewport=None):
+        """Return the mean color of the tiles of a level inside a viewport, as a uint8 (rows, cols, 3) array."""
+        index, _ = self.crop(level, viewport)
+        return self.levels[level]["rgb"][index]
+
+    def thermal(self, temp, level=0, viewport=None):
+        """Return the mean thermal value at a temperature of the tiles of a level inside a viewport."""
+        index, _ = self.crop(level, viewport)
+        return temp * self.levels[level]["conductivity"][index]
+
+    def types(self, level=0, viewport=None):
+        """Return the dominant type id of the tiles of a level inside a viewport."""
+        index, _ = self.crop(level, viewport)
+        return self.levels[level]["types"][index]
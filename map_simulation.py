@@ -1,37 +1,707 @@
 import numpy as np
-from blocks import Block
+import instrumentation
+from blocks import Block, SparseBlockGrid
+from items import ITEM_CLASSES, MATERIAL_ATTRIBUTES, MATERIALS, constructor_defaults, get_item_type_id
+from layers import DenseLayers, SparseLayers
+from occupancy import OccupancyIndex, compact_cells, item_footprint_offsets
+from scene import read_scene, write_scene
+from view_cache import ViewCache
+
+def _in_selection(x, y, region, mask):
+    """Return which of the blocks at the coordinate arrays x, y lie in a region (x0, y0, x1, y1) and a mask."""
+    selected = np.ones(len(x), dtype=bool)
+    if region is not None:
+        x0, y0, x1, y1 = region
+        selected &= (x >= x0) & (x < x1) & (y >= y0) & (y < y1)
+    if mask is not None:
+        selected &= mask[x, y]
+    return selected
+
+def _select(values, mask):
+    """Return the values of the items selected by a boolean mask, keeping values shared by all items broadcast."""
+    if not values.strides[0]:  # Broadcast values take no memory per item, so keep them that way
+        return np.broadcast_to(values[0], (np.count_nonzero(mask),) + values.shape[1:])
+    return values[mask]
+
 
 class MapSimulation:
-    def __init__(self, width, height):
-        # Initialize a 2D grid of blocks for the map
+    def __init__(self, width, height, sparse=False):
+        """
+        A width x height map of blocks, each holding a default grass item plus any items added to it.
+
+        With sparse=True only the blocks that are accessed or modified are stored, and grass is implied
+        everywhere else, so that very large maps cost memory in proportion to their contents.
+        """
         self.width = width
         self.height = height
-        self.blocks = [[Block((i, j)) for j in range(width)] for i in range(height)]  # Create blocks based on grid size
+        self.sparse = sparse
+        if sparse:
+            self._blocks = SparseBlockGrid(height, width)  # Blocks are created when first indexed
+            self.layers = SparseLayers(height, width)
+        else:
+            # Initialize a 2D grid of blocks for the map
+            self._blocks = [[Block((i, j)) for j in range(width)] for i in range(height)]  # Create blocks based on grid size
+            self.layers = DenseLayers(height, width)  # Structure-of-arrays layers, so the views never walk the blocks
+        self.occupancy = OccupancyIndex(height, width, sparse)  # Blocks covered by the footprints of the placed items
+        self._pending = []  # Batches placed by add_items whose Item objects are not created yet
+        self._index = None  # Per-type item index, built by _item_index and then kept up to date as items change
+        self.views = ViewCache(self.layers)  # Views patched incrementally as blocks change
+
+    @property
+    def blocks(self):
+        """The blocks of the map, indexed as blocks[x][y]; items placed in bulk are created on first access."""
+        if self._pending:
+            self._materialize_pending()
+        return self._blocks
+
+    @property
+    def type_ids(self):
+        """Type id of the top item of every block."""
+        return self.layers.layer("type_ids")
+
+    @property
+    def top_colors(self):
+        """RGB color of the top item of every block."""
+        return self.layers.layer("top_colors")
+
+    @property
+    def conductivity_sum(self):
+        """Summed thermal conductivity of the items of every block."""
+        return self.layers.layer("conductivity_sum")
+
+    @property
+    def item_counts(self):
+        """Number of items in every block."""
+        return self.layers.layer("item_counts")
 
     def add_items_to_block(self, x, y, items):
         """
         Add a list of items to the block at the given (x, y) position.
-        
+
         Raises an IndexError if the coordinates are out of bounds.
         """
-        if 0 <= x < len(self.blocks) and 0 <= y < len(self.blocks[0]):  # Ensure (x, y) is within map bounds
-            self.blocks[x][y].items.extend(items)  # Add items to the block
+        if 0 <= x < self.height and 0 <= y < self.width:  # Ensure (x, y) is within map bounds
+            self._block(x, y).items.extend(items)  # Add items to the block
+            self._sync_block(x, y)
+            self._reindex_block(x, y)
+            for item in items:
+                self._mark_footprint(x, y, item)
         else:
             raise IndexError(f"Coordinates ({x}, {y}) are out of bounds.")  # Handle out-of-bounds error
 
+    def add_items(self, positions, item_type, on_collision="reject", **params):
+        """
+        Place many items of one type at once, checking their footprints against the occupancy index.
+
+        Collisions are resolved in one vectorized pass with the same outcome as placing the items one by one:
+        an item is rejected when its footprint overlaps an already placed item or an earlier item of the batch.
+        The layers are updated in bulk, and the Item objects are only created when the blocks are accessed.
+
+        Args:
+            positions (array-like): (N, 2) array of (x, y) blocks.
+            item_type (type): Item class to place, e.g. Tree.
+            on_collision (str): "reject" to skip colliding items, or "ignore" to place every item.
+            **params: Constructor arguments of item_type (e.g. radius, width, length), or item attributes to
+                override (thermal_conductivity, color), as scalars or one value per item.
+
+        Returns:
+            np.ndarray: Boolean mask of the items that were placed.
+
+        Raises an IndexError if any position is out of bounds.
+        """
+        if on_collision not in ("reject", "ignore"):
+            raise ValueError(f"on_collision must be 'reject' or 'ignore', not {on_collision!r}.")
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        x, y = positions[:, 0], positions[:, 1]
+        outside = (x < 0) | (x >= self.height) | (y < 0) | (y >= self.width)
+        if outside.any():
+            bad = np.argmax(outside)
+            raise IndexError(f"Coordinates ({x[bad]}, {y[bad]}) are out of bounds.")  # Handle out-of-bounds error
+
+        # Constructor arguments of every item, filled in from the defaults of item_type
+        defaults = constructor_defaults(item_type)
+        attributes = {name: value for name, value in params.items() if name not in defaults}
+        params = {name: np.broadcast_to(params.get(name, default), len(x)) for name, default in defaults.items()}
+        if not len(x):
+            return np.zeros(0, dtype=bool)
+        prototype = item_type((0, 0), **{name: values[0] for name, values in params.items()})
+        for name, value in attributes.items():
+            if not hasattr(prototype, name):
+                raise TypeError(f"{item_type.__name__} has no parameter or attribute {name!r}.")
+            attributes[name] = np.broadcast_to(value, (len(x),) + np.shape(getattr(prototype, name)))
+
+        index, cx, cy = self.occupancy.item_cells(prototype.name, x, y, params)
+
+        if on_collision == "reject":
+            accepted = self.occupancy.resolve(index, cx, cy, len(x))
+        else:
+            accepted = np.ones(len(x), dtype=bool)
+        placed = accepted[index]
+        self.occupancy.mark(cx[placed], cy[placed])
+        if accepted.any():
+            self._insert_batch(item_type, prototype, x[accepted], y[accepted],
+                               {name: _select(values, accepted) for name, values in params.items()},
+                               {name: _select(values, accepted) for name, values in attributes.items()})
+        return accepted
+
+    def _insert_batch(self, item_type, prototype, x, y, params, attributes):
+        """Add a batch of items of one type to the layers, and queue them to be created in their blocks."""
+        cells, codes = compact_cells(x * self.width + y, self.width * self.height)
+        n_cells = self.width * self.height if cells is None else len(cells)
+        counts = np.bincount(codes, minlength=n_cells)
+        present = np.flatnonzero(counts)
+        keys = present if cells is None else cells[present]
+        bx, by = keys // self.width, keys % self.width
+
+        conductivity = attributes.get("thermal_conductivity")
+        if conductivity is None:
+            added_conductivity = counts[present] * prototype.thermal_conductivity
+        else:
+            added_conductivity = np.bincount(codes, weights=conductivity, minlength=n_cells)[present]
+        top_colors = prototype.get_rgb()
+        if "color" in attributes:
+            last = np.zeros(n_cells, dtype=np.int64)
+            np.maximum.at(last, codes, np.arange(len(codes)))  # The last item of each block ends up on top
+            top_colors = attributes["color"][last[present]]
+
+        self.layers.set_blocks(bx, by,
+                               type_ids=get_item_type_id(prototype.name),
+                               top_colors=top_colors,
+                               conductivity_sum=self.layers.values("conductivity_sum", bx, by) + added_conductivity,
+                               item_counts=self.layers.values("item_counts", bx, by) + counts[present])
+        self.views.mark(bx, by)
+        if max(self.height, self.width) <= np.iinfo(np.int32).max:
+            x, y = x.astype(np.int32), y.astype(np.int32)  # Halves the memory of the queued positions
+        self._pending.append((item_type, x, y, params, attributes))
+        if self._index is not None:
+            empty = np.empty(0, dtype=np.int64)
+            index_x, index_y, created = self._index.get(item_type, (empty, empty, np.empty(0, dtype=bool)))
+            self._index[item_type] = (np.concatenate([index_x, x]), np.concatenate([index_y, y]),
+                                      np.concatenate([created, np.zeros(len(x), dtype=bool)]))
+
+    def _block(self, x, y):
+        """Return the block at (x, y), creating only its own pending items, so that edits cost O(1) blocks."""
+        if self._pending:
+            self._materialize_pending((x, y, x + 1, y + 1))
+        return self._blocks[x][y]
+
+    def _materialize_pending(self, viewport=None):
+        """
+        Create the Item objects of the batches placed by add_items in their blocks.
+
+        With a viewport (x0, y0, x1, y1), only the items of the blocks inside it are created and the others
+        stay queued. Every block then has either all or none of its queued items created, in placement order.
+        """
+        pending, self._pending = self._pending, []
+        if self._index is not None:
+            # The queued items of the viewport's blocks are about to exist as objects
+            for index_x, index_y, created in self._index.values():
+                created |= True if viewport is None else _in_selection(index_x, index_y, viewport, None)
+        if viewport is not None:
+            x0, y0, x1, y1 = viewport
+            inside_batches = []
+            for batch in pending:
+                item_type, x, y, params, attributes = batch
+                inside = (x >= x0) & (x < x1) & (y >= y0) & (y < y1)
+                if not inside.any():
+                    self._pending.append(batch)  # Batches outside the viewport stay queued as they are
+                    continue
+                for mask, batches in ((inside, inside_batches), (~inside, self._pending)):
+                    if mask.any():
+                        batches.append((item_type, x[mask], y[mask],
+                                        {name: _select(values, mask) for name, values in params.items()},
+                                        {name: _select(values, mask) for name, values in attributes.items()}))
+            pending = inside_batches
+        for item_type, x, y, params, attributes in pending:
+            columns = {name: values.tolist() for name, values in params.items()}
+            overrides = {name: values.tolist() for name, values in attributes.items()}
+            for i, (bx, by) in enumerate(zip(x.tolist(), y.tolist())):
+                item = item_type((bx, by), **{name: values[i] for name, values in columns.items()})
+                for name, values in overrides.items():
+                    value = values[i]
+                    setattr(item, name, tuple(value) if isinstance(value, list) else value)
+                self._blocks[bx][by].items.append(item)
+
+    def find_items(self, item_type, where=None):
+        """
+        Return the anchor blocks and constructor arguments of the items of a type, without creating them.
+
+        Args:
+            item_type (type): Item class to find, e.g. Pond.
+            where (callable): Optional filter, called with the dict of constructor arguments (one array of
+                values per argument) and returning a boolean mask of the items to keep.
+
+        Returns:
+            tuple: (x, y, params) with the x and y arrays of the items and their constructor arguments.
+        """
+        name = item_type.__name__
+        xs, ys, columns = [], [], {param: [] for param in constructor_defaults(item_type)}
+        for group in self._item_groups():
+            if group["type"] != name:
+                continue
+            x, y = np.asarray(group["x"], dtype=np.int64), np.asarray(group["y"], dtype=np.int64)
+            params = {param: np.broadcast_to(values, len(x)) for param, values in group["params"].items()}
+            if where is not None:
+                keep = np.asarray(where(params), dtype=bool)
+                x, y, params = x[keep], y[keep], {param: values[keep] for param, values in params.items()}
+            xs.append(x)
+            ys.append(y)
+            for param, values in params.items():
+                columns[param].append(values)
+        x = np.concatenate(xs) if xs else np.empty(0, dtype=np.int64)
+        y = np.concatenate(ys) if ys else np.empty(0, dtype=np.int64)
+        return x, y, {param: np.concatenate(values) if values else np.empty(0) for param, values in columns.items()}
+
+    def _iter_created_blocks(self):
+        """Yield (x, y, block) for the blocks holding more than grass whose Item objects exist, in row-major order."""
+        sparse = isinstance(self._blocks, SparseBlockGrid)
+        for x, y in zip(*[coordinates.tolist() for coordinates in self.layers.occupied()]):
+            if sparse:
+                block = self._blocks.cells.get((x, y))  # Do not create blocks that only hold pending items
+                if block is not None:
+                    yield x, y, block
+            else:
+                yield x, y, self._blocks[x][y]
+
+    def _item_index(self):
+        """
+        Return the per-type item index: item class -> (x, y, created) arrays with one entry per item.
+
+        created tells the items that exist as Item objects from those still queued in pending batches. The
+        index is built once, in the order of _item_groups, and then updated in place as items are placed or
+        created, and for the edited block only when items are added to one (see _reindex_block).
+        """
+        if self._index is not None:
+            return self._index
+        columns = {}
+        for x, y, block in self._iter_created_blocks():
+            for item in block.items[1:]:
+                columns.setdefault(type(item), []).append((x, y, True))
+        index = {}
+        for item_type, positions in columns.items():
+            x, y, created = (np.array(values) for values in zip(*positions))
+            index[item_type] = [[x], [y], [created]]
+        for item_type, x, y, _, _ in self._pending:
+            entry = index.setdefault(item_type, [[], [], []])
+            entry[0].append(np.asarray(x, dtype=np.int64))
+            entry[1].append(np.asarray(y, dtype=np.int64))
+            entry[2].append(np.zeros(len(x), dtype=bool))
+        self._index = {item_type: tuple(np.concatenate(values) for values in entry) for item_type, entry in index.items()}
+        return self._index
+
+    def _reindex_block(self, x, y):
+        """Replace the index entries of the block at (x, y) by its current items, which all exist as objects."""
+        if self._index is None:
+            return
+        for item_type, (index_x, index_y, created) in list(self._index.items()):
+            keep = (index_x != x) | (index_y != y)
+            if not keep.all():
+                self._index[item_type] = (index_x[keep], index_y[keep], created[keep])
+        counts = {}
+        for item in self._blocks[x][y].items[1:]:
+            counts[type(item)] = counts.get(type(item), 0) + 1
+        for item_type, count in counts.items():
+            empty = np.empty(0, dtype=np.int64)
+            index_x, index_y, created = self._index.get(item_type, (empty, empty, np.empty(0, dtype=bool)))
+            self._index[item_type] = (np.append(index_x, [x] * count), np.append(index_y, [y] * count),
+                                      np.append(created, [True] * count))
+
+    def select_items(self, item_type, region=None, mask=None):
+        """
+        Return the blocks of the items of a type inside a region and a mask, without creating the items.
+
+        Args:
+            item_type (type): Item class to select, e.g. Tree.
+            region (tuple): Optional (x0, y0, x1, y1) blocks, half-open like a viewport.
+            mask (np.ndarray): Optional (height, width) boolean array of the blocks to select.
+
+        Returns:
+            np.ndarray: (N, 2) array of the (x, y) block of every selected item, one row per item.
+        """
+        if mask is not None:
+            mask = self._check_mask(mask)
+        empty = np.empty(0, dtype=np.int64)
+        x, y, _ = self._item_index().get(item_type, (empty, empty, empty))
+        selected = _in_selection(x, y, region, mask)
+        return np.stack([x[selected], y[selected]], axis=1)
+
+    def modify_items(self, item_type, region=None, mask=None, **attributes):
+        """
+        Set material attributes of all the items of a type inside a region and a mask at once.
+
+        Items still queued from add_items are changed in one array operation per batch, without creating them;
+        created items are switched to one shared override material per material they had, which an item
+        copies before it is edited on its own again. The conductivity and top color layers of the affected blocks are
+        then updated in one vectorized pass, and the cached views patched.
+
+        Args:
+            item_type (type): Item class to modify, e.g. Tree.
+            region (tuple): Optional (x0, y0, x1, y1) blocks, half-open like a viewport.
+            mask (np.ndarray): Optional (height, width) boolean array of the blocks to modify.
+            **attributes: New values of material attributes (thermal_conductivity, color), shared by all items.
+
+        Returns:
+            int: Number of items modified.
+        """
+        unknown = [name for name in attributes if name not in MATERIAL_ATTRIBUTES]
+        if unknown:
+            raise TypeError(f"modify_items can only set {', '.join(MATERIAL_ATTRIBUTES)}, not {', '.join(unknown)}.")
+        if mask is not None:
+            mask = self._check_mask(mask)
+        empty = np.empty(0, dtype=np.int64)
+        x, y, created = self._item_index().get(item_type, (empty, empty, empty))
+        selected = _in_selection(x, y, region, mask)
+        if not selected.any() or not attributes:
+            return int(np.count_nonzero(selected))
+
+        conductivity = attributes.get("thermal_conductivity")
+        # Created items: one override material per material they had, shared by all of its items, so that only
+        # a material reference is switched per item
+        created_keys, created_deltas = [], []
+        overrides_of = {}  # id of a replaced material -> (that material, its override)
+        blocks = np.unique(x[selected & created] * self.width + y[selected & created])
+        for bx, by in zip((blocks // self.width).tolist(), (blocks % self.width).tolist()):
+            for item in self._blocks[bx][by].items[1:]:
+                if type(item) is item_type:
+                    old, override = overrides_of.get(id(item._material), (item._material, None))
+                    if override is None:
+                        override = old.copy(shared=True)
+                        for name, value in attributes.items():
+                            setattr(override, name, value)
+                        overrides_of[id(old)] = (old, override)  # Keeps the old material alive, so ids stay unique
+                    if conductivity is not None:
+                        created_keys.append(bx * self.width + by)
+                        created_deltas.append(conductivity - old.thermal_conductivity)
+                    item._material = override
+        # Flat index of the block and conductivity change of every modified item
+        keys, deltas = [np.array(created_keys, dtype=np.int64)], [np.array(created_deltas, dtype=float)]
+
+        # Queued items: one array update per batch
+        prototype = None
+        for i, (batch_type, bx, by, params, overrides) in enumerate(self._pending):
+            if batch_type is not item_type:
+                continue
+            batch_selected = _in_selection(bx, by, region, mask)
+            if not batch_selected.any():
+                continue
+            if prototype is None:
+                prototype = item_type((0, 0))
+            overrides = dict(overrides)
+            for name, value in attributes.items():
+                shape = (len(bx),) + np.shape(getattr(prototype, name))
+                old = overrides.get(name, np.broadcast_to(getattr(prototype, name), shape))
+                if name == "thermal_conductivity":
+                    keys.append(bx[batch_selected].astype(np.int64) * self.width + by[batch_selected])
+                    deltas.append(value - old[batch_selected])
+                if batch_selected.all():
+                    overrides[name] = np.broadcast_to(value, shape)  # Shared values stay broadcast
+                else:
+                    overrides[name] = np.array(old)
+                    overrides[name][batch_selected] = value
+            self._pending[i] = (batch_type, bx, by, params, overrides)
+
+        changed = np.unique(x[selected] * self.width + y[selected])
+        keys = np.concatenate(keys)
+        if len(keys):
+            cells, codes = compact_cells(keys, self.width * self.height)
+            n_cells = self.width * self.height if cells is None else len(cells)
+            added = np.bincount(codes, weights=np.concatenate(deltas), minlength=n_cells)
+            present = np.flatnonzero(np.bincount(codes, minlength=n_cells))
+            blocks = present if cells is None else cells[present]
+            cx, cy = blocks // self.width, blocks % self.width
+            self.layers.set_blocks(cx, cy, conductivity_sum=self.layers.values("conductivity_sum", cx, cy) + added[present])
+        cx, cy = changed // self.width, changed % self.width
+        if "color" in attributes:
+            # Every item of the type in a selected block is modified, so a block topped by the type changes color
+            topped = self.layers.values("type_ids", cx, cy) == get_item_type_id(item_type.__name__)
+            self.layers.set_blocks(cx[topped], cy[topped], top_colors=attributes["color"])
+        self.views.mark(cx, cy)
+        return int(np.count_nonzero(selected))
+
+    def _check_mask(self, mask):
+        """Return a block mask as a boolean array, checking that it covers the map."""
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != (self.height, self.width):
+            raise ValueError(f"The mask must have the shape of the map, {(self.height, self.width)}, not {mask.shape}.")
+        return mask
+
+    def type_layers(self, name):
+        """
+        Return the number of items of a type in every block and their summed thermal conductivity.
+
+        The default grass item of every block counts as a Grass item, with the conductivity the block's other
+        items leave of conductivity_sum, so grass edited with modify_item_in_block counts as edited. Together
+        with conductivity_sum, these give the conductivity of the blocks with another conductivity for the
+        type, without rebuilding the map.
+
+        Args:
+            name (str): Item type name, e.g. "Tree".
+
+        Returns:
+            tuple: (counts, conductivity) as (height, width) int32 and float64 arrays.
+        """
+        n_blocks = self.height * self.width
+        counts = np.zeros(n_blocks, dtype=np.int32)
+        conductivity = np.zeros(n_blocks)
+        grass = name == "Grass"
+        if grass:
+            counts += 1
+            conductivity += self.conductivity_sum.ravel()
+        for group in self._item_groups():
+            if not grass and group["type"] != name:
+                continue
+            keys = np.asarray(group["x"], dtype=np.int64) * self.width + np.asarray(group["y"], dtype=np.int64)
+            # Items only add their conductivity to their anchor block, as in _insert_batch
+            values = group["attributes"].get("thermal_conductivity", MATERIALS[group["type"]].thermal_conductivity)
+            added = np.bincount(keys, weights=np.broadcast_to(values, len(keys)), minlength=n_blocks)
+            if grass:
+                conductivity -= added  # What the other items leave is the grass
+            else:
+                counts += np.bincount(keys, minlength=n_blocks).astype(np.int32)
+                conductivity += added
+        return counts.reshape(self.height, self.width), conductivity.reshape(self.height, self.width)
+
+    def remove_items(self, item_type):
+        """
+        Remove every item of a type from the map, e.g. to hand the animals over to AnimalAgents.
+
+        The blocks they covered stay marked in the occupancy index.
+
+        Returns:
+            np.ndarray: (N, 2) array of the blocks the removed items were in, in row-major order.
+        """
+        name = item_type.__name__
+        blocks = self.blocks
+        self._index = None  # Rebuilt on next use, as most blocks may change
+        positions = []
+        for x, y in zip(*[coordinates.tolist() for coordinates in self.layers.occupied()]):
+            items = blocks[x][y].items
+            kept = [item for item in items if item.name != name]
+            if len(kept) < len(items):
+                positions += [(x, y)] * (len(items) - len(kept))
+                items[:] = kept
+                self._sync_block(x, y)
+        return np.array(positions, dtype=np.int64).reshape(-1, 2)
+
+    def save(self, path):
+        """
+        Save the map as a scene file: hand-editable JSON for a .json path, or columnar .npz arrays otherwise.
+
+        See scene.py for both formats. Items placed with add_items and not created yet are saved as they
+        were placed, without creating them. Grass edited with modify_item_in_block is saved as "Grass" groups.
+        """
+        write_scene(path, {"width": self.width, "height": self.height, "sparse": self.sparse,
+                           "groups": self._grass_groups() + self._item_groups(),
+                           "layers": self.layers.to_arrays(), "occupancy": self.occupancy.to_arrays()})
+
+    def _item_groups(self):
+        """
+        Group the items by type, geometry and material overrides, in an order that rebuilds the map.
+
+        Created items are ordered by their depth in their block (the first item above the grass, then the
+        second, ...) and followed by the pending batches, so placing the groups one after the other stacks
+        every block the same way again.
+        """
+        prototypes = {}
+        groups = {}
+        for x, y, block in self._iter_created_blocks():
+            for depth, item in enumerate(block.items[1:]):
+                item_type = type(item)
+                if item_type not in prototypes:
+                    prototypes[item_type] = item_type((0, 0))
+                params = tuple((name, getattr(item, name)) for name in constructor_defaults(item_type))
+                attributes = tuple((name, getattr(item, name)) for name in MATERIAL_ATTRIBUTES
+                                   if getattr(item, name) != getattr(prototypes[item_type], name))
+                groups.setdefault((depth, item_type, params, attributes), []).append((x, y))
+
+        batches = []
+        for (_, item_type, params, attributes), positions in sorted(groups.items(), key=lambda group: group[0][0]):
+            positions = np.array(positions, dtype=np.int64)
+            batches.append((item_type, positions[:, 0], positions[:, 1], dict(params), dict(attributes)))
+        batches.extend(self._pending)
+
+        result = []
+        for item_type, x, y, params, attributes in batches:
+            if ITEM_CLASSES.get(item_type.__name__) is not item_type:
+                raise ValueError(f"Items of class {item_type.__name__} cannot be saved in a scene.")
+            result.append({"type": item_type.__name__, "x": x, "y": y, "params": params, "attributes": attributes})
+        return result
+
+    def _grass_groups(self):
+        """
+        Group the blocks whose default grass item was edited by their material overrides.
+
+        Returns:
+            list: "Grass" groups, like those of _item_groups but without params.
+        """
+        grass = MATERIALS["Grass"]
+        if isinstance(self._blocks, SparseBlockGrid):
+            candidates = sorted(self._blocks.cells)  # Only the blocks that were accessed can have edited grass
+        else:
+            # Edited grass shows in the layers of grass-only blocks; the other blocks are checked one by one
+            plain = self.layers.layer("item_counts") == 1
+            edited = (self.layers.layer("conductivity_sum") != grass.thermal_conductivity) | \
+                (self.layers.layer("top_colors") != grass.color).any(axis=-1)
+            candidates = zip(*[coordinates.tolist() for coordinates in np.nonzero(~plain | edited)])
+        groups = {}
+        for x, y in candidates:
+            item = self._blocks[x][y].items[0]
+            attributes = tuple((name, getattr(item, name)) for name in MATERIAL_ATTRIBUTES
+                               if getattr(item, name) != getattr(grass, name))
+            if attributes:
+                groups.setdefault(attributes, []).append((x, y))
+        result = []
+        for attributes, positions in groups.items():
+            positions = np.array(positions, dtype=np.int64)
+            result.append({"type": "Grass", "x": positions[:, 0], "y": positions[:, 1], "params": {},
+                           "attributes": dict(attributes)})
+        return result
+
+    def _restore_grass(self, group):
+        """Set the material overrides of a "Grass" group on the grass items of its blocks, without creating their items."""
+        grass = MATERIALS["Grass"]
+        x, y = np.asarray(group["x"]).tolist(), np.asarray(group["y"]).tolist()
+        overrides = {name: np.broadcast_to(values, (len(x),) + np.shape(getattr(grass, name))).tolist()
+                     for name, values in group["attributes"].items()}
+        for i, (bx, by) in enumerate(zip(x, y)):
+            item = self._blocks[bx][by].items[0]
+            for name, values in overrides.items():
+                setattr(item, name, tuple(values[i]) if isinstance(values[i], list) else values[i])
+
+    @classmethod
+    def load(cls, path, sparse=None):
+        """
+        Load a map saved with save, or a hand-written JSON scene.
+
+        Columnar scenes are memory-mapped: their layers are used as they are and the items are only created
+        when the blocks are accessed, so loading is near-instant whatever the map size. JSON scenes are placed
+        again with add_items.
+
+        Args:
+            path (str): Path of a .json or .npz scene.
+            sparse (bool): Storage mode of a map loaded from JSON (default is the one saved in the scene).
+        """
+        scene = read_scene(path)
+        if scene["layers"] is None:
+            simulation_map = cls(scene["width"], scene["height"], sparse=scene["sparse"] if sparse is None else sparse)
+            grass_groups = [group for group in scene["groups"] if group["type"] == "Grass"]
+            for group in scene["groups"]:
+                if group["type"] != "Grass":
+                    simulation_map.add_items(np.stack([group["x"], group["y"]], axis=1), ITEM_CLASSES[group["type"]],
+                                             on_collision=group["on_collision"], **group["params"], **group["attributes"])
+            for group in grass_groups:
+                simulation_map._restore_grass(group)
+                for x, y in zip(np.asarray(group["x"]).tolist(), np.asarray(group["y"]).tolist()):
+                    simulation_map._sync_block(x, y)
+            return simulation_map
+
+        # Blocks are created on demand whatever the layer storage, so no per-block objects are allocated here
+        simulation_map = cls(scene["width"], scene["height"], sparse=True)
+        simulation_map.sparse = scene["sparse"]
+        layers_type = SparseLayers if scene["sparse"] else DenseLayers
+        simulation_map.layers = layers_type(scene["height"], scene["width"], arrays=scene["layers"])
+        simulation_map.occupancy = OccupancyIndex(scene["height"], scene["width"], scene["sparse"], scene["occupancy"])
+        simulation_map.views = ViewCache(simulation_map.layers)
+        for group in scene["groups"]:
+            if group["type"] == "Grass":
+                simulation_map._restore_grass(group)  # The saved layers already include the edited grass
+            else:
+                simulation_map._pending.append((ITEM_CLASSES[group["type"]], group["x"], group["y"],
+                                                group["params"], group["attributes"]))
+        return simulation_map
+
     def generate_rgb_view(self):
-        """Generate a 2D array of RGB values representing the entire map view."""
-        return np.array([[block.get_rgb() for block in row] for row in self.blocks])  # Return RGB data for all blocks
+        """
+        Generate a 2D array of RGB values representing the entire map view.
+
+        The view is cached and only the blocks changed since the last call are recomputed. It is returned
+        read-only; copy it to modify it.
+        """
+        with instrumentation.span("generate_rgb_view"):
+            return self.views.rgb()  # Color of the top item of every block
 
     def generate_thermal_view(self, temp):
-        """Generate a 2D array of thermal values for the entire map based on the given temperature."""
-        return np.array([[block.get_thermal(temp) for block in row] for row in self.blocks])  # Return thermal data for all blocks
+        """
+        Generate a 2D array of thermal values for the entire map based on the given temperature.
+
+        Views of recently used temperatures are cached and patched after edits, like generate_rgb_view.
+        """
+        with instrumentation.span("generate_thermal_view"):
+            return self.views.thermal(temp)  # Block.get_thermal is linear in temp
+
+    def generate_thermal_views(self, temps, dtype=np.float64):
+        """
+        Generate a stack of thermal views, one for each temperature, in one broadcasted computation.
+
+        Args:
+            temps (array-like): Temperatures of the T timesteps, at any time resolution.
+            dtype: Floating point type of the result (float32 halves the memory of long stacks).
+
+        Returns:
+            np.ndarray: Array of shape (T, height, width), where entry t equals generate_thermal_view(temps[t]).
+        """
+        temps = np.asarray(temps, dtype=dtype).reshape(-1)
+        with instrumentation.span("generate_thermal_views", steps=len(temps)):
+            return np.multiply.outer(temps, self.mean_conductivity().astype(dtype, copy=False))
+
+    def iter_items(self, viewport=None):
+        """
+        Yield (x, y, item) for every item placed on the map, skipping the default grass of each block.
+
+        Only blocks holding more than the grass item are visited, in row-major order. With a viewport
+        (x0, y0, x1, y1), only the blocks with x0 <= x < x1 and y0 <= y < y1 are visited.
+        """
+        if viewport is None:
+            blocks = self.blocks
+        else:
+            if self._pending:
+                self._materialize_pending(viewport)  # Only the items in view are created
+            blocks = self._blocks
+        for x, y in zip(*self.layers.occupied(viewport)):
+            for item in blocks[x][y].items[1:]:
+                yield int(x), int(y), item
+
+    def mean_conductivity(self):
+        """Return the per-block average thermal conductivity of all items as a read-only 2D array."""
+        return self.views.mean_conductivity()
+
+    def lod_pyramid(self, min_size=64):
+        """
+        Return the level-of-detail pyramid of the map, for drawing zoomed-out views.
+
+        The pyramid is cached with the views: it is built on the first call, and again on the first call
+        after the map is edited.
+        """
+        return self.views.lod_pyramid(min_size)
 
     def modify_item_in_block(self, x, y, item_name, **kwargs):
         """
         Modify the attributes of an item in a specific block at position (x, y).
-        
-        Ensures the block exists within the map before attempting to modify the item.
+
+        Ensures the block exists within the map before attempting to modify the item. A house resized with
+        size marks its new footprint in the occupancy index, so that later add_items calls collide with it.
         """
         if 0 <= x < self.height and 0 <= y < self.width:  # Check if (x, y) is within map boundaries
-            self.blocks[x][y].modify_item(item_name, **kwargs)  # Modify the item in the specified block
+            block = self._block(x, y)
+            block.modify_item(item_name, **kwargs)  # Modify the item in the specified block
+            self._sync_block(x, y)  # The modified item may be the top one or change the conductivity
+            if "size" in kwargs:
+                # Block.modify_item resizes the first item of that name; blocks it no longer covers stay marked
+                item = next((item for item in block.items if item.name == item_name), None)
+                if item is not None:
+                    self._mark_footprint(x, y, item)
+
+    def _mark_footprint(self, x, y, item):
+        """Mark the blocks covered by an item anchored at block (x, y) in the occupancy index."""
+        _, cx, cy = self.occupancy.footprint_cells(np.array([x]), np.array([y]), item_footprint_offsets(item))
+        self.occupancy.mark(cx, cy)
+
+    def _sync_block(self, x, y):
+        """Recompute the array layers of the block at (x, y) from its items."""
+        items = self._block(x, y).items
+        self.layers.set_block(x, y,
+                              type_ids=get_item_type_id(items[-1].name),
+                              top_colors=items[-1].get_rgb(),
+                              conductivity_sum=sum(item.thermal_conductivity for item in items),
+                              item_counts=len(items))
+        self.views.mark(x, y)
@@ -0,0 +1,235 @@
+import numpy as np
+
+def footprint_offsets(name, radius=None, width=None, length=None):
+    """
+    Return the (dx, dy) offsets of the blocks covered by an item, relative to the block it is placed in.
+
+    Trees and ponds cover the blocks whose centers lie within their radius, houses extend width blocks
+    along y and length blocks towards lower x (upwards on the plots), and roads extend width blocks along y.
+    Every other item covers only its own block.
+    """
+    if name in ("Tree", "Pond"):
+        reach = int(np.floor(radius))
+        dx, dy = np.meshgrid(np.arange(-reach, reach + 1), np.arange(-reach, reach + 1), indexing="ij")
+        inside = dx ** 2 + dy ** 2 <= radius ** 2
+        dx, dy = dx[inside], dy[inside]
+        if not len(dx):
+            dx, dy = np.zeros(1, dtype=int), np.zeros(1, dtype=int)  # Small circles still cover their own block
+        return dx, dy
+    elif name == "House":
+        dx, dy = np.meshgrid(np.arange(-int(np.ceil(length)) + 1, 1), np.arange(int(np.ceil(width))), indexing="ij")
+        return dx.ravel(), dy.ravel()
+    elif name == "Road":
+        dy = np.arange(max(int(np.ceil(width)), 1))
+        return np.zeros_like(dy), dy
+    return np.zeros(1, dtype=int), np.zeros(1, dtype=int)
+
+def item_footprint_offsets(item):
+    """Return the footprint offsets of an existing item from its own geometry."""
+    return footprint_offsets(item.name, **{name: getattr(item, name) for name in ("radius", "width", "length")
+                                           if hasattr(item, name)})
+
+
+class OccupancyIndex:
+    def __init__(self, height, width, sparse=False, arrays=None):
+        """
+        Index of the blocks covered by the footprints of the placed items.
+
+        Dense maps use a packed bitmap, one bit per block, allocated on the first placement. Sparse maps
+        keep the sorted flat indices of the covered blocks instead, so the index grows with the contents
+        and not with the map size. arrays optionally provides the index, as returned by to_arrays.
+        """
+        self.shape = (height, width)
+        self.sparse = sparse
+        arrays = arrays or {}
+        self.bits = arrays.get("bits")
+        self.keys = arrays.get("keys", np.empty(0, dtype=np.int64))  # Sorted flat indices of the covered blocks (sparse maps)
+        self._unsorted = []  # Flat indices marked since keys was last sorted (sparse maps)
+
+    def to_arrays(self):
+        """Return the arrays that fully describe the index, to be saved and passed back as arrays."""
+        if self.sparse:
+            return {"keys": self._sorted_keys()}
+        return {} if self.bits is None else {"bits": self.bits}
+
+    def _sorted_keys(self):
+        """Merge the recently marked blocks into the sorted keys of a sparse index."""
+        if self._unsorted:
+            self.keys = np.unique(np.concatenate([self.keys] + self._unsorted))
+            self._unsorted = []
+        return self.keys
+
+    def is_occupied(self, x, y):
+        """Return a boolean array telling which of the blocks (x, y) are covered by an item."""
+        x, y = np.asarray(x), np.asarray(y)
+        if self.sparse:
+            keys = self._sorted_keys()
+            flat = x.astype(np.int64) * self.shape[1] + y
+            found = np.minimum(np.searchsorted(keys, flat), max(len(keys) - 1, 0))
+            return keys[found] == flat if len(keys) else np.zeros(x.shape, dtype=bool)
+        if self.bits is None:
+            return np.zeros(x.shape, dtype=bool)
+        return (self.bits[x, y >> 3] & (0x80 >> (y & 7)).astype(np.uint8)) != 0
+
+    def mark(self, x, y):
+        """Mark the blocks (x, y) as covered."""
+        x, y = np.asarray(x), np.asarray(y)
+        if self.sparse:
+            self._unsorted.append((x.astype(np.int64) * self.shape[1] + y).ravel())
+            return
+        if self.bits is None:
+            self.bits = np.zeros((self.shape[0], (self.shape[1] + 7) // 8), dtype=np.uint8)
+        np.bitwise_or.at(self.bits, (x, y >> 3), (0x80 >> (y & 7)).astype(np.uint8))
+
+    def as_array(self):
+        """Return the occupancy as a (height, width) boolean array."""
+        if self.sparse:
+            occupied = np.zeros(self.shape, dtype=bool)
+            occupied.flat[self._sorted_keys()] = True
+            return occupied
+        if self.bits is None:
+            return np.zeros(self.shape, dtype=bool)
+        return np.unpackbits(self.bits, axis=1, count=self.shape[1]).astype(bool)
+
+    def footprint_cells(self, x, y, offsets, shape_index=None):
+        """
+        Expand anchor blocks into the blocks of their footprints, dropping the ones outside the map.
+
+        Args:
+            x, y (np.ndarray): Anchor blocks of N items.
+            offsets (list): (dx, dy) footprint offsets of each distinct shape, or a single pair shared by all items.
+            shape_index (np.ndarray): Shape of each item, as an index into offsets (when offsets is a list).
+
+        Returns:
+            tuple: (item index, x, y) arrays with one entry per covered block.
+        """
+        if isinstance(offsets, tuple):
+            dx, dy = offsets
+            index = np.repeat(np.arange(len(x)), len(dx))
+            cx = (x[:, None] + dx).ravel()
+            cy = (y[:, None] + dy).ravel()
+        else:
+            sizes = np.array([len(dx) for dx, _ in offsets])
+            starts = np.cumsum(sizes) - sizes
+            all_dx = np.concatenate([dx for dx, _ in offsets])
+            all_dy = np.concatenate([dy for _, dy in offsets])
+            counts = sizes[shape_index]
+            index = np.repeat(np.arange(len(x)), counts)
+            # Position of each covered block within the offsets of its item's shape
+            rank = np.arange(len(index)) - np.repeat(np.cumsum(counts) - counts, counts)
+            flat = np.repeat(starts[shape_index], counts) + rank
+            cx = x[index] + all_dx[flat]
+            cy = y[index] + all_dy[flat]
+        inside = (cx >= 0) & (cx < self.shape[0]) & (cy >= 0) & (cy < self.shape[1])
+        return index[inside], cx[inside], cy[inside]
+
+    def item_cells(self, name, x, y, params):
+        """
+        Expand items of one type into the blocks of their footprints, with one set of offsets per distinct geometry.
+
+        Args:
+            name (str): Item type name.
+            x, y (np.ndarray): Anchor blocks of N items.
+            params (dict): Constructor arguments of the items as arrays of N values; radius, width and length
+                set the footprints.
+
+        Returns:
+            tuple: (item index, x, y) arrays with one entry per covered block, as footprint_cells.
+        """
+        geometry = {param: values for param, values in params.items() if param in ("radius", "width", "length")}
+        varying = [values for values in geometry.values() if values.strides[0]]  # Broadcast scalars have stride 0
+        if varying:
+            shape_keys = np.stack([values.astype(float) for values in geometry.values()], axis=1)
+            shapes, shape_index = np.unique(shape_keys, axis=0, return_inverse=True)
+            offsets = [footprint_offsets(name, **dict(zip(geometry, shape))) for shape in shapes]
+            return self.footprint_cells(x, y, offsets, shape_index.ravel())
+        offsets = footprint_offsets(name, **{param: values[0] for param, values in geometry.items()})
+        return self.footprint_cells(x, y, offsets)
+
+    def resolve(self, index, cx, cy, n_items, max_rounds=4):
+        """
+        Decide which of n_items candidate items can be placed without overlapping.
+
+        Items are placed in order: an item is accepted when none of its blocks is already covered and it
+        does not overlap an earlier accepted item, exactly as placing them one by one would decide. This is
+        computed in a few vectorized rounds: in each round every undecided item that claims all of its blocks
+        first is accepted, and the items overlapping it are rejected. Long chains of overlapping items only
+        lose an item or two per round, so after max_rounds rounds the items still undecided are scanned in
+        order instead, which costs one pass over them whatever the length of the chains.
+
+        Args:
+            index, cx, cy (np.ndarray): Covered blocks of the items, as returned by item_cells, sorted by item.
+            n_items (int): Number of candidate items.
+            max_rounds (int): Number of vectorized rounds before the ordered scan.
+
+        Returns:
+            np.ndarray: Boolean mask of the accepted items.
+        """
+        cells, cell_index = compact_cells(cx.astype(np.int64) * self.shape[1] + cy, self.shape[0] * self.shape[1])
+        n_cells = self.shape[0] * self.shape[1] if cells is None else len(cells)
+        accepted = np.ones(n_items, dtype=bool)
+        accepted[index] = False  # Items covering no block (e.g. zero-width houses) are always placed
+        # Items whose blocks are already covered are rejected up front
+        ids = index.astype(np.int32) if n_items < np.iinfo(np.int32).max else index
+        starts, sizes = _runs(ids)
+        free = ~np.logical_or.reduceat(self.is_occupied(cx, cy), starts) if len(ids) else np.zeros(0, dtype=bool)
+        keep = np.repeat(free, sizes)
+        ids, inverse = ids[keep], cell_index[keep]  # Blocks of the undecided items, shrinking every round
+        first_claim = np.full(n_cells, n_items, dtype=ids.dtype)
+        taken = np.zeros(n_cells, dtype=bool)
+        for _ in range(max_rounds):
+            if not len(ids):
+                return accepted
+            starts, sizes = _runs(ids)
+            np.minimum.at(first_claim, inverse, ids)
+            # Items are sorted, so each one is a run of blocks and per-item tests reduce over the runs
+            newly_accepted = np.logical_and.reduceat(first_claim[inverse] == ids, starts)
+            claimed = np.repeat(newly_accepted, sizes)
+            taken[inverse[claimed]] = True
+            rejected = np.logical_or.reduceat(taken[inverse] & ~claimed, starts)
+            first_claim[inverse] = n_items  # Reset only the touched entries for the next round
+            taken[inverse[claimed]] = False
+            accepted[ids[starts[newly_accepted]]] = True
+            keep = np.repeat(~newly_accepted & ~rejected, sizes)
+            ids, inverse = ids[keep], inverse[keep]
+        if len(ids):
+            # The undecided items never overlap an accepted one, so only their own blocks matter
+            accepted[_ordered_scan(ids, inverse)] = True
+        return accepted
+
+
+def _runs(ids):
+    """Return the start and length of the run of every distinct value of a sorted array."""
+    starts = np.flatnonzero(np.concatenate([[True], ids[1:] != ids[:-1]])) if len(ids) else np.zeros(0, dtype=np.int64)
+    return starts, np.diff(np.append(starts, len(ids)))
+
+def _ordered_scan(ids, cells):
+    """
+    Place items one by one in order, given the blocks of each one sorted by item; return the accepted items.
+
+    Used for what vectorized rounds leave undecided, which is little except along long overlap chains.
+    """
+    starts, sizes = _runs(ids)
+    ends = starts + sizes
+    cells = cells.tolist()
+    taken = set()
+    accepted = []
+    for item, start, end in zip(ids[starts].tolist(), starts.tolist(), ends.tolist()):
+        item_cells = cells[start:end]
+        if taken.isdisjoint(item_cells):
+            taken.update(item_cells)
+            accepted.append(item)
+    return np.array(accepted, dtype=np.int64)
+
+def compact_cells(keys, n_blocks):
+    """
+    Number the distinct flat block indices in keys.
+
+    Returns (cells, codes): the sorted distinct keys, and the index of each key in cells. When the map is
+    small compared to keys the flat indices are used as the codes themselves, which saves sorting them, and
+    cells is None.
+    """
+    if n_blocks <= 4 * len(keys):
+        return None, keys
+    cells, codes = np.unique(keys, return_inverse=True)
+    return cells, codes.ravel()
@@ -0,0 +1,65 @@
+import numpy as np
+from items import MATERIALS
+
+GRASS_BACKGROUND = (144, 238, 144)  # Light green background representing grass or open land
+
+DRAW_ORDER = ("Road", "Pond", "House", "Tree", "Animal")  # Item types that are drawn, ground features first
+
+# Colors of the drawn item types in the RGB and thermal views, from the shared materials
+RGB_ITEM_COLORS = {name: MATERIALS[name].color for name in DRAW_ORDER}
+THERMAL_ITEM_COLORS = {name: MATERIALS[name].thermal_color for name in DRAW_ORDER}
+
+ROAD_THERMAL_ALPHA = 0.8  # Roads are slightly see-through in the thermal view
+
+# Segment data of matplotlib's 'hot' colormap: (x, value below x, value above x) for each channel
+HOT_SEGMENTS = {
+    "red": ((0.0, 0.0416, 0.0416), (0.365079, 1.0, 1.0), (1.0, 1.0, 1.0)),
+    "green": ((0.0, 0.0, 0.0), (0.365079, 0.0, 0.0), (0.746032, 1.0, 1.0), (1.0, 1.0, 1.0)),
+    "blue": ((0.0, 0.0, 0.0), (0.746032, 0.0, 0.0), (1.0, 1.0, 1.0)),
+}
+
+def normalize_color(color):
+    """Convert RGB values from the 0-255 range to the 0-1 range for plotting."""
+    return tuple(c / 255.0 for c in color)
+
+def rgb_item_color(name, hour):
+    """
+    Return the 0-1 RGB color of an item type in the RGB view at the given hour.
+
+    hour may also be an array of T hours, in which case a (T, 3) array of colors is returned.
+    """
+    if name == "Pond":
+        return normalize_color((0, 0, 255))  # Water keeps its color
+
+    # Brightness factor simulates day/night effect, higher during the day and lower at night
+    brightness_factor = np.sin(np.pi * np.asarray(hour) / 24)
+    base_color = np.array(RGB_ITEM_COLORS.get(name, [255, 255, 255])) / 255.0
+    return np.clip(base_color * brightness_factor[..., None], 0, 1)
+
+def thermal_item_color(name, hour):
+    """
+    Return the 0-1 RGB color of an item type in the thermal view at the given hour.
+
+    hour may also be an array of T hours, in which case a (T, 3) array of colors is returned.
+    """
+    # Override certain item types like water and roads to keep their fixed colors
+    if name == "Pond":
+        return normalize_color((0, 0, 255))  # Always blue for water
+    elif name == "Road":
+        return normalize_color((128, 128, 128))  # Always gray for roads
+
+    # Contrast factor simulates the effect of day/night on the thermal map
+    contrast_factor = np.sin(np.pi * np.asarray(hour) / 24)
+    base_color = np.array(THERMAL_ITEM_COLORS.get(name, [255, 255, 255])) / 255.0
+    return np.clip(base_color * contrast_factor[..., None], 0, 1)
+
+def hot_colormap_lut(n=256):
+    """Return the 'hot' colormap as an (n, 3) uint8 lookup table, sampled the way matplotlib does."""
+    x = np.linspace(0, 1, n)
+    channels = [np.interp(x, [s[0] for s in HOT_SEGMENTS[c]], [s[1] for s in HOT_SEGMENTS[c]])
+                for c in ("red", "green", "blue")]
+    return to_uint8(np.stack(channels, axis=-1))
+
+def to_uint8(color):
+    """Convert 0-1 colors to 0-255 uint8 values."""
+    return (np.asarray(color) * 255 + 0.5).astype(np.uint8)
@@ -0,0 +1,123 @@
+import numpy as np
+from items import Animal, House, Pond, Road, Tree
+from map_simulation import MapSimulation
+
+# Sizes of the features, as (low, high) ranges drawn uniformly for every feature, high excluded
+ROAD_SPACING = (18, 40)  # Blocks between neighbouring parallel roads
+RIVER_WIDTH = (2, 4)  # Width of the river strip, in blocks
+HOUSE_WIDTH = (3, 9)
+HOUSE_LENGTH = (2, 5)
+FOREST_SPREAD = (2.0, 6.0)  # Standard deviation of the tree positions around the center of a forest
+HERD_SIZE = (4, 12)  # Animals per herd
+
+# Expected number of features per block of map area
+HOUSES_PER_ROAD_BLOCK = 0.06
+FORESTS_PER_BLOCK = 1 / 500
+PONDS_PER_BLOCK = 1 / 900
+HERDS_PER_BLOCK = 1 / 700
+
+def _road_lines(rng, size):
+    """Return the offsets of the parallel roads across one side of the map, a random spacing apart."""
+    lines = []
+    offset = rng.integers(ROAD_SPACING[0] // 2, ROAD_SPACING[1] // 2)
+    while offset < size - 2:
+        lines.append(int(offset))
+        offset += rng.integers(*ROAD_SPACING)
+    return lines
+
+def _river(rng, height, width):
+    """Return the blocks of a river meandering from the top edge of the map to the bottom edge."""
+    river_width = rng.integers(*RIVER_WIDTH)
+    # A random walk of the left bank, with momentum so that the river bends smoothly
+    drift = np.cumsum(np.clip(np.cumsum(rng.normal(0, 0.15, height)), -1, 1))
+    left = np.clip(np.rint(rng.integers(0, width) + drift), 0, max(width - river_width, 0)).astype(np.int64)
+    x = np.repeat(np.arange(height), river_width)
+    y = (left[:, None] + np.arange(river_width)).ravel()
+    return np.stack([x, y], axis=1)
+
+def _clusters(rng, centers, sizes, spread, height, width):
+    """Return the distinct blocks of normally distributed clusters of points around centers."""
+    points = np.repeat(centers, sizes, axis=0) + rng.normal(0, 1, (sizes.sum(), 2)) * np.repeat(spread, sizes)[:, None]
+    points = np.rint(points).astype(np.int64)
+    inside = (points[:, 0] >= 0) & (points[:, 0] < height) & (points[:, 1] >= 0) & (points[:, 1] < width)
+    _, first = np.unique(points[inside], axis=0, return_index=True)
+    return points[inside][np.sort(first)]
+
+def _random_centers(rng, n, height, width):
+    return np.stack([rng.uniform(0, height, n), rng.uniform(0, width, n)], axis=1)
+
+def generate_map(width=50, height=36, seed=0, sparse=None, rivers=1):
+    """
+    Generate a random scene on a new map: road networks, rivers, houses, forests, ponds and animal herds.
+
+    Features are laid out in that order with on_collision="reject", so they never overlap: rivers pass
+    under the roads, houses line the roads, and forests, ponds and herds fill the open land in between.
+    The number of features grows with the area of the map, and the same seed always gives the same map.
+
+    Args:
+        width, height (int): Size of the map in blocks.
+        seed: Seed of the random generator, an int or a sequence of ints (e.g. (dataset seed, scene index)).
+        sparse (bool): Whether the map is sparse (default: maps of more than a million blocks).
+        rivers (int): Number of rivers.
+
+    Returns:
+        MapSimulation: The generated map.
+    """
+    if sparse is None:
+        sparse = width * height > 1 << 20
+    rng = np.random.default_rng(seed)
+    simulation_map = MapSimulation(width, height, sparse=sparse)
+    area = width * height
+
+    # Road network: vertical roads are two blocks wide, horizontal ones are two rows of one-block-wide items
+    columns, rows = _road_lines(rng, width), _road_lines(rng, height)
+    for column in columns:
+        simulation_map.add_items(np.stack([np.arange(height), np.full(height, column)], axis=1), Road, width=2)
+    for row in rows:
+        for x in (row, row + 1):
+            simulation_map.add_items(np.stack([np.full(width, x), np.arange(width)], axis=1), Road, width=1)
+
+    for _ in range(rivers):
+        # A strip of one-block ponds like the river of the example, drawn as touching circles rather than not at all
+        simulation_map.add_items(_river(rng, height, width), Pond, radius=0.5)
+
+    # Houses face the roads, one block back from them, on either side
+    anchors = []
+    for column in columns:
+        n = rng.poisson(HOUSES_PER_ROAD_BLOCK * height * 2)
+        house_width, length = rng.integers(*HOUSE_WIDTH, n), rng.integers(*HOUSE_LENGTH, n)
+        east = rng.random(n) < 0.5
+        x = rng.integers(0, height, n)
+        y = np.where(east, column + 3, column - 1 - house_width)
+        anchors.append((x, y, house_width, length))
+    for row in rows:
+        n = rng.poisson(HOUSES_PER_ROAD_BLOCK * width * 2)
+        house_width, length = rng.integers(*HOUSE_WIDTH, n), rng.integers(*HOUSE_LENGTH, n)
+        south = rng.random(n) < 0.5
+        x = np.where(south, row + 2 + length, row - 2)  # Houses extend towards lower x from their anchor
+        y = rng.integers(0, width, n)
+        anchors.append((x, y, house_width, length))
+    if anchors:
+        x, y, house_width, length = (np.concatenate(values) for values in zip(*anchors))
+        # Houses must fit on the map entirely
+        inside = (x - length + 1 >= 0) & (x < height) & (y >= 0) & (y + house_width <= width)
+        simulation_map.add_items(np.stack([x[inside], y[inside]], axis=1), House,
+                                 width=house_width[inside], length=length[inside])
+
+    # Forests: dense clusters of trees of slightly varying sizes
+    n = rng.poisson(FORESTS_PER_BLOCK * area)
+    spread = rng.uniform(*FOREST_SPREAD, n)
+    trees = _clusters(rng, _random_centers(rng, n, height, width), np.rint(5 * spread ** 2).astype(np.int64) + 1,
+                      spread, height, width)
+    simulation_map.add_items(trees, Tree, radius=rng.uniform(0.3, 0.45, len(trees)))
+
+    n = rng.poisson(PONDS_PER_BLOCK * area)
+    ponds = np.rint(_random_centers(rng, n, height, width)).astype(np.int64).clip(0, [height - 1, width - 1])
+    simulation_map.add_items(ponds, Pond, radius=rng.choice([1, 2], n))
+
+    # Animal herds graze together in the open
+    n = rng.poisson(HERDS_PER_BLOCK * area)
+    animals = _clusters(rng, _random_centers(rng, n, height, width), rng.integers(*HERD_SIZE, n),
+                        np.full(n, 2.0), height, width)
+    simulation_map.add_items(animals, Animal)
+    return simulation_map
@@ -0,0 +1,130 @@
+import numpy as np
+from palette import (DRAW_ORDER, GRASS_BACKGROUND, ROAD_THERMAL_ALPHA, hot_colormap_lut, rgb_item_color,
+                     thermal_item_color, to_uint8)
+
+HOT_LUT = hot_colormap_lut()  # 256-entry lookup table of the thermal colormap
+
+def _shape_params(item):
+    """Return the shape of an item as (kind, size) in cell units, or None for items that are not drawn."""
+    if item.name in ("Tree", "Pond"):
+        return ("circle", item.radius)
+    elif item.name == "Animal":
+        return ("circle", 0.15)
+    elif item.name == "House":
+        # Houses grow to the right and upwards from the bottom-left corner of their block
+        return ("rect", (1 - item.length, 1, 0, item.width))
+    elif item.name == "Road":
+        # Roads are one block high, offset by half a block up and to the left
+        return ("rect", (0.5, 1.5, -0.5, item.width - 0.5))
+    return None
+
+def _stamp(kind, size, scale):
+    """
+    Return the (row, column) pixel offsets covered by a shape, relative to the top-left pixel of its block.
+
+    A pixel is covered when its center lies inside the shape.
+    """
+    if kind == "circle":
+        reach = int(np.ceil(size * scale)) + scale
+        offsets = np.arange(-reach, reach + 1)
+        centers = (offsets + 0.5) / scale - 0.5  # Pixel centers relative to the block center
+        rows, cols = np.meshgrid(offsets, offsets, indexing="ij")
+        inside = centers[:, None] ** 2 + centers[None, :] ** 2 <= size ** 2
+        return rows[inside], cols[inside]
+    top, bottom, left, right = size
+    rows = np.arange(int(np.floor(top * scale)) - 1, int(np.ceil(bottom * scale)) + 1)
+    cols = np.arange(int(np.floor(left * scale)) - 1, int(np.ceil(right * scale)) + 1)
+    rows = rows[((rows + 0.5) / scale >= top) & ((rows + 0.5) / scale <= bottom)]
+    cols = cols[((cols + 0.5) / scale >= left) & ((cols + 0.5) / scale <= right)]
+    rows, cols = np.meshgrid(rows, cols, indexing="ij")
+    return rows.ravel(), cols.ravel()
+
+
+class MapRasterizer:
+    def __init__(self, simulation_map, scale=8):
+        """
+        Pure-NumPy rasterizer drawing the same scene as plot_map_rgb / plot_map_thermal into uint8 images.
+
+        The pixels covered by every item type are computed once, with one vectorized stamp per distinct
+        shape, so each frame is only a background fill plus one fancy-indexed assignment per item type.
+        Shapes are not antialiased and have no edge stroke.
+
+        Args:
+            simulation_map (MapSimulation): The map to draw.
+            scale (int): Supersampling factor, the number of pixels along each side of a block.
+        """
+        self.scale = scale
+        self.shape = (simulation_map.height * scale, simulation_map.width * scale)
+
+        # Group the items by type and shape, so that each group shares one stamp
+        groups = {}
+        for i, j, item in simulation_map.iter_items():
+            params = _shape_params(item)
+            if params is not None:
+                groups.setdefault((item.name, params), []).append((i, j))
+
+        # Flat indices of the pixels covered by each item type
+        self.pixels = {}
+        n_rows, n_cols = self.shape
+        for (name, (kind, size)), blocks in groups.items():
+            blocks = np.array(blocks)
+            d_rows, d_cols = _stamp(kind, size, scale)
+            rows = blocks[:, :1] * scale + d_rows
+            cols = blocks[:, 1:] * scale + d_cols
+            inside = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+            self.pixels.setdefault(name, []).append(rows[inside] * n_cols + cols[inside])
+        self.pixels = {name: np.unique(np.concatenate(self.pixels[name])) for name in DRAW_ORDER if name in self.pixels}
+
+    def _upsample(self, cells):
+        """Repeat each block of a (T, H, W, 3) array into scale x scale pixels."""
+        frames = cells.shape[0]
+        height, width = cells.shape[1:3]
+        out = np.empty((frames, height, self.scale, width, self.scale, 3), dtype=np.uint8)
+        out[:] = cells[:, :, None, :, None, :]
+        return out.reshape(frames, height * self.scale, width * self.scale, 3)
+
+    def rgb(self, hours):
+        """
+        Rasterize the RGB view at the given hour, or at each hour of an array in one pass.
+
+        Returns:
+            np.ndarray: uint8 image of shape (H*s, W*s, 3), or (T, H*s, W*s, 3) for an array of hours.
+        """
+        hours = np.asarray(hours, dtype=float)
+        stack = hours.reshape(-1)
+        frames = np.empty((len(stack),) + self.shape + (3,), dtype=np.uint8)
+        frames[:] = GRASS_BACKGROUND
+        flat = frames.reshape(len(stack), -1, 3)
+        for name, pixels in self.pixels.items():
+            colors = np.broadcast_to(to_uint8(rgb_item_color(name, stack)), (len(stack), 3))
+            flat[:, pixels] = colors[:, None, :]
+        return frames if hours.ndim else frames[0]
+
+    def thermal(self, map_thermal_views, hours):
+        """
+        Rasterize the thermal view: the 'hot' colormap of the thermal values with the items on top.
+
+        Each frame is normalized to its own min/max, like imshow. Takes a (H, W) view and one hour, or a
+        (T, H, W) stack and T hours (simulate_full_day passes the temperature here).
+
+        Returns:
+            np.ndarray: uint8 image of shape (H*s, W*s, 3), or (T, H*s, W*s, 3) for a stack.
+        """
+        map_thermal_views = np.asarray(map_thermal_views)
+        stack = map_thermal_views.reshape((-1,) + map_thermal_views.shape[-2:])
+        hours = np.broadcast_to(np.asarray(hours, dtype=float).reshape(-1), len(stack))
+
+        # Color the thermal values through the lookup table, with the same 256 bins as matplotlib
+        low = stack.min(axis=(1, 2), keepdims=True)
+        span = stack.max(axis=(1, 2), keepdims=True) - low
+        normalized = np.divide(stack - low, span, out=np.full(stack.shape, 0.5), where=span > 0)
+        index = np.clip((normalized * len(HOT_LUT)).astype(np.intp), 0, len(HOT_LUT) - 1)
+        frames = self._upsample(HOT_LUT[index])
+
+        flat = frames.reshape(len(stack), -1, 3)
+        for name, pixels in self.pixels.items():
+            colors = np.broadcast_to(thermal_item_color(name, hours), (len(stack), 3))[:, None, :]
+            if name == "Road":
+                colors = ROAD_THERMAL_ALPHA * colors + (1 - ROAD_THERMAL_ALPHA) * flat[:, pixels] / 255.0
+            flat[:, pixels] = to_uint8(colors)
+        return frames if map_thermal_views.ndim == 3 else frames[0]
@@ -0,0 +1,197 @@
+import json
+import struct
+import zipfile
+import numpy as np
+from items import ITEM_CLASSES, MATERIALS, constructor_defaults
+
+SCENE_VERSION = 1
+
+def _group_columns(type_name):
+    """
+    Return the constructor parameters of a group type and an object holding its default attributes.
+
+    "Grass" groups hold the overrides of the default grass item of blocks, which has no item class and no
+    parameters; their defaults are those of the grass material.
+    """
+    if type_name == "Grass":
+        return [], MATERIALS["Grass"]
+    item_type = ITEM_CLASSES[type_name]
+    return list(constructor_defaults(item_type)), item_type((0, 0))
+
+def _json_value(value):
+    """Convert a scalar, tuple or per-item array to plain JSON values, collapsing arrays of one repeated value."""
+    if isinstance(value, np.ndarray) and len(value) and (value == value[0]).all():
+        value = value[0]  # The same value for every item
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return list(value) if isinstance(value, tuple) else value
+
+def write_scene(path, scene):
+    """
+    Write a scene file: JSON for a .json path, columnar NumPy arrays otherwise.
+
+    The JSON form lists the item groups with their positions and is meant to be edited by hand. The columnar
+    form (an uncompressed .npz) stores per-type item columns plus the map's layers and occupancy, so that
+    read_scene can memory-map them instead of rebuilding anything.
+
+    Args:
+        path (str): Output path.
+        scene (dict): "width", "height", "sparse", the item "groups" in placement order (dicts with the class
+            name "type", "x" and "y" arrays, and "params" and "attributes" dicts of scalars or per-item arrays),
+            and the "layers" and "occupancy" arrays, as built by MapSimulation.save. "Grass" groups have no
+            params and hold the attributes of edited grass.
+    """
+    if path.endswith(".json"):
+        _write_json(path, scene)
+    else:
+        _write_columns(path, scene)
+
+def _write_json(path, scene, per_line=12):
+    """Write the groups as JSON, with their positions wrapped per_line to a line."""
+    entries = []
+    for group in scene["groups"]:
+        entry = {"type": group["type"]}
+        entry.update({name: _json_value(value) for name, value in group["params"].items()})
+        entry.update({name: _json_value(value) for name, value in group["attributes"].items()})
+        positions = [json.dumps(position) for position in np.stack([group["x"], group["y"]], axis=1).tolist()]
+        rows = [", ".join(positions[i:i + per_line]) for i in range(0, len(positions), per_line)]
+        entries.append("    " + json.dumps(entry)[:-1] + ', "positions": [\n        '
+                       + ",\n        ".join(rows) + "\n    ]}")
+    with open(path, "w") as f:
+        f.write("{\n")
+        f.write(f'  "version": {SCENE_VERSION},\n')
+        f.write(f'  "width": {scene["width"]},\n')
+        f.write(f'  "height": {scene["height"]},\n')
+        f.write(f'  "sparse": {json.dumps(scene["sparse"])},\n')
+        f.write('  "items": [\n' + ",\n".join(entries) + "\n  ]\n}\n")
+
+def _write_columns(path, scene):
+    """Write per-type item columns, the layers and the occupancy to an uncompressed .npz file."""
+    groups = scene["groups"]
+    meta = {"version": SCENE_VERSION, "width": scene["width"], "height": scene["height"],
+            "sparse": scene["sparse"], "types": {}}
+    starts = np.cumsum([0] + [len(group["x"]) for group in groups])  # Rank of each group's first item
+    columns = {}
+    for type_name in dict.fromkeys(group["type"] for group in groups):
+        params, prototype = _group_columns(type_name)
+        typed = [(start, group) for start, group in zip(starts, groups) if group["type"] == type_name]
+        attributes = list(dict.fromkeys(name for _, group in typed for name in group["attributes"]))
+        meta["types"][type_name] = {"params": params, "attributes": attributes}
+
+        # Rank of every item in the placement order, to restore the order across types when loading
+        columns[f"{type_name}.seq"] = np.concatenate([start + np.arange(len(group["x"])) for start, group in typed])
+        columns[f"{type_name}.x"] = np.concatenate([group["x"] for _, group in typed])
+        columns[f"{type_name}.y"] = np.concatenate([group["y"] for _, group in typed])
+        for name in params:
+            columns[f"{type_name}.{name}"] = np.concatenate([np.broadcast_to(group["params"][name], len(group["x"]))
+                                                             for _, group in typed])
+        for name in attributes:
+            default = getattr(prototype, name)
+            columns[f"{type_name}.{name}"] = np.concatenate([
+                np.broadcast_to(group["attributes"].get(name, default), (len(group["x"]),) + np.shape(default))
+                for _, group in typed])
+
+    columns.update({f"layers.{name}": array for name, array in scene["layers"].items()})
+    columns.update({f"occupancy.{name}": array for name, array in scene["occupancy"].items()})
+    columns["meta"] = np.array(json.dumps(meta))
+    with open(path, "wb") as f:  # A file object, so that numpy does not append .npz to the path
+        np.savez(f, **columns)
+
+def read_scene(path):
+    """
+    Read a scene file written by write_scene, or a hand-written JSON scene.
+
+    Large arrays of columnar scenes are memory-mapped copy-on-write, so reading takes about the same time
+    for any map size and the arrays are only paged in when used.
+
+    Returns:
+        dict: The scene, as passed to write_scene. JSON scenes have no "layers" and "occupancy" (they are
+            None), and their groups have an "on_collision" mode for add_items.
+    """
+    if path.endswith(".json"):
+        return _read_json(path)
+    return _read_columns(path)
+
+def _read_json(path):
+    """Read a JSON scene, whose groups are placed again with add_items when loading."""
+    with open(path) as f:
+        data = json.load(f)
+    groups = []
+    for entry in data["items"]:
+        entry = dict(entry)
+        type_name = entry.pop("type")
+        if type_name not in ITEM_CLASSES and type_name != "Grass":
+            raise ValueError(f"Unknown item type {type_name!r} in {path}.")
+        positions = np.asarray(entry.pop("positions"), dtype=np.int64).reshape(-1, 2)
+        on_collision = entry.pop("on_collision", "ignore")
+        params = {name: entry.pop(name) for name in _group_columns(type_name)[0] if name in entry}
+        groups.append({"type": type_name, "x": positions[:, 0], "y": positions[:, 1],
+                       "params": params, "attributes": entry, "on_collision": on_collision})
+    return {"width": data["width"], "height": data["height"], "sparse": data.get("sparse", False),
+            "groups": groups, "layers": None, "occupancy": None}
+
+def _read_columns(path):
+    """Read a columnar scene, splitting the per-type columns back into groups in placement order."""
+    arrays = load_npz(path)
+    meta = json.loads(str(arrays["meta"]))
+    if meta["version"] > SCENE_VERSION:
+        raise ValueError(f"{path} was written by a newer version (scene format {meta['version']}).")
+
+    # Walk the items in placement order, cutting a group wherever the type changes
+    types = list(meta["types"])
+    seq = [arrays[f"{type_name}.seq"] for type_name in types]
+    type_of_rank = np.empty(sum(len(ranks) for ranks in seq), dtype=np.int64)
+    for code, ranks in enumerate(seq):
+        type_of_rank[ranks] = code
+    cuts = np.flatnonzero(np.diff(type_of_rank)) + 1
+    # A map without items has no group at all, not one empty group
+    runs = zip(np.concatenate([[0], cuts]), np.concatenate([cuts, [len(type_of_rank)]])) if len(type_of_rank) else ()
+    groups = []
+    used = [0] * len(types)  # Items of each type already assigned to a group; they are stored in placement order
+    for start, stop in runs:
+        code = type_of_rank[start]
+        type_name = types[code]
+        rows = slice(used[code], used[code] + stop - start)  # Slices keep the memory-mapped columns zero-copy
+        used[code] = rows.stop
+        columns = meta["types"][type_name]
+        groups.append({"type": type_name,
+                       "x": arrays[f"{type_name}.x"][rows], "y": arrays[f"{type_name}.y"][rows],
+                       "params": {name: arrays[f"{type_name}.{name}"][rows] for name in columns["params"]},
+                       "attributes": {name: arrays[f"{type_name}.{name}"][rows] for name in columns["attributes"]}})
+
+    def prefixed(prefix):
+        return {name[len(prefix):]: array for name, array in arrays.items() if name.startswith(prefix)}
+    return {"width": meta["width"], "height": meta["height"], "sparse": meta["sparse"],
+            "groups": groups, "layers": prefixed("layers."), "occupancy": prefixed("occupancy.")}
+
+def load_npz(path, mmap_threshold=1 << 16):
+    """
+    Load the arrays of an .npz file, memory-mapping the large ones instead of reading them.
+
+    np.load cannot memory-map the members of an .npz archive, but the members of an uncompressed archive are
+    plain .npy files stored as they are, so each one is mapped at its offset in the archive. Members that are
+    compressed, or smaller than mmap_threshold bytes, are read normally.
+
+    Returns:
+        dict: Member name (without .npy) -> array; mapped arrays are copy-on-write, the file is never modified.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[:-len(".npy")]
+            if info.compress_type != zipfile.ZIP_STORED or info.file_size < mmap_threshold:
+                with archive.open(info) as member:
+                    arrays[name] = np.load(member)
+                continue
+            # The data follows the 30-byte local file header, the file name and the extra field
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            arrays[name] = np.memmap(path, dtype=dtype, mode="c", offset=f.tell(), shape=shape,
+                                     order="F" if fortran_order else "C")
+    return arrays
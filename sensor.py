@@ -0,0 +1,166 @@
+import numpy as np
+import instrumentation
+
+def gaussian_psf(sigma):
+    """Return a normalized 2D Gaussian point-spread function of standard deviation sigma pixels, 3 sigma wide."""
+    radius = max(int(np.ceil(3 * sigma)), 1)
+    offsets = np.arange(-radius, radius + 1)
+    profile = np.exp(-0.5 * (offsets / max(sigma, 1e-9)) ** 2)
+    kernel = np.outer(profile, profile)
+    return kernel / kernel.sum()
+
+def _fast_length(n):
+    """Return the smallest length of at least n with no prime factors above 5, which FFTs handle fastest."""
+    best = 2 * n
+    power5 = 1
+    while power5 < best:
+        power3 = power5
+        while power3 < best:
+            length = power3
+            while length < n:
+                length *= 2
+            best = min(best, length)
+            power3 *= 3
+        power5 *= 5
+    return best
+
+def area_resampling_matrix(n_in, n_out):
+    """
+    Return the (n_out, n_in) matrix resampling a line of n_in pixels to n_out pixels by area averaging.
+
+    Every output pixel averages the input pixels it overlaps, weighted by the overlap, like a detector
+    integrating the light falling on it. Upsampling repeats the input values.
+    """
+    edges_out = np.arange(n_out + 1) * (n_in / n_out)  # Output pixel edges in input pixel units
+    start, stop = edges_out[:-1, None], edges_out[1:, None]
+    left, right = np.arange(n_in)[None, :], np.arange(1, n_in + 1)[None, :]
+    overlap = np.clip(np.minimum(stop, right) - np.maximum(start, left), 0, None)
+    return overlap / (n_in / n_out)
+
+
+class ThermalSensor:
+    def __init__(self, resolution=None, psf_sigma=0.7, psf=None, netd=0.05, fixed_pattern_offset=0.2,
+                 fixed_pattern_gain=0.01, bits=14, value_range=(-20.0, 60.0), seed=0, dtype=np.float32,
+                 chunk_bytes=1 << 18):
+        """
+        Model of a thermal camera turning ideal thermal views into the counts the camera would output.
+
+        Each frame is resampled to the sensor resolution by area averaging (the detector pixels integrating
+        the scene), blurred by the optics' point-spread function (an FFT convolution, in sensor pixels),
+        offset by fixed-pattern noise (a per-pixel gain and offset, drawn once per sensor), disturbed by
+        temporal noise of standard deviation netd, and quantized by a bits-bit ADC over value_range.
+        A (T, H, W) stack goes through every stage as batched array operations on chunks of frames of about
+        chunk_bytes, which keeps the FFTs in cache: a batched FFT over the whole stack is slower than a loop.
+
+        Args:
+            resolution (tuple): (rows, cols) of the sensor (default is the resolution of the views).
+            psf_sigma (float): Standard deviation of the Gaussian point-spread function, in sensor pixels
+                (0 for no blur).
+            psf (np.ndarray): Custom point-spread function kernel in sensor pixels, used instead of the Gaussian.
+            netd (float): Noise-equivalent temperature difference, the standard deviation of the temporal noise.
+            fixed_pattern_offset (float): Standard deviation of the per-pixel offsets.
+            fixed_pattern_gain (float): Standard deviation of the per-pixel gains around 1.
+            bits (int): Resolution of the ADC.
+            value_range (tuple): Thermal values mapped to the lowest and highest count; values outside clip.
+            seed (int): Seed of the fixed pattern and of the temporal noise.
+            dtype: Floating point type of the computation.
+            chunk_bytes (int): Size of the chunks of frames processed together.
+        """
+        self.resolution = resolution
+        self.psf = psf if psf is not None else (gaussian_psf(psf_sigma) if psf_sigma > 0 else None)
+        if self.psf is not None:
+            self.psf = np.asarray(self.psf, dtype=dtype) / np.sum(self.psf)
+        self.netd = netd
+        self.fixed_pattern_offset = fixed_pattern_offset
+        self.fixed_pattern_gain = fixed_pattern_gain
+        self.bits = bits
+        self.value_range = value_range
+        self.seed = seed
+        self.dtype = dtype
+        self.chunk_bytes = chunk_bytes
+        self.rng = np.random.default_rng(seed)
+        self._cache = {}  # Input shape -> (resampling matrices, padded shape, transfer function, gain, offset)
+
+    def _setup(self, shape):
+        """Return the resampling matrices, optical transfer function and fixed pattern for views of a shape."""
+        if shape in self._cache:
+            return self._cache[shape]
+        rows, cols = self.resolution or shape
+        # No matrix when a side keeps its size, which saves the product
+        row_matrix = area_resampling_matrix(shape[0], rows).astype(self.dtype) if rows != shape[0] else None
+        col_matrix = area_resampling_matrix(shape[1], cols).T.astype(self.dtype) if cols != shape[1] else None
+
+        padded = transfer = None
+        if self.psf is not None:
+            # The frames are edge-padded by at least the kernel radius, so the circular FFT convolution does not
+            # wrap around, up to lengths the FFT is fast for
+            radius = (self.psf.shape[0] // 2, self.psf.shape[1] // 2)
+            padded = (_fast_length(rows + 2 * radius[0]), _fast_length(cols + 2 * radius[1]))
+            kernel = np.zeros(padded, dtype=self.dtype)
+            kernel[:self.psf.shape[0], :self.psf.shape[1]] = self.psf
+            kernel = np.roll(kernel, (-radius[0], -radius[1]), axis=(0, 1))  # Kernel center at the origin
+            transfer = np.fft.rfft2(kernel)
+
+        # The fixed pattern belongs to the sensor, so it only depends on the seed and the resolution
+        pattern_rng = np.random.default_rng((self.seed, rows, cols))
+        gain = (1 + self.fixed_pattern_gain * pattern_rng.standard_normal((rows, cols))).astype(self.dtype)
+        offset = (self.fixed_pattern_offset * pattern_rng.standard_normal((rows, cols))).astype(self.dtype)
+        self._cache[shape] = (row_matrix, col_matrix, padded, transfer, gain, offset)
+        return self._cache[shape]
+
+    def _blur(self, frames, padded, transfer):
+        """Convolve a (T, rows, cols) stack with the point-spread function, all frames in one FFT."""
+        top, left = self.psf.shape[0] // 2, self.psf.shape[1] // 2
+        rows, cols = frames.shape[1:]
+        frames = np.pad(frames, ((0, 0), (top, padded[0] - rows - top), (left, padded[1] - cols - left)), mode="edge")
+        blurred = np.fft.irfft2(np.fft.rfft2(frames) * transfer, s=padded)
+        return blurred[:, top:top + rows, left:left + cols]
+
+    def capture(self, thermal_views, rng=None):
+        """
+        Return the counts the sensor outputs for a thermal view or a (T, H, W) stack of them.
+
+        Args:
+            thermal_views (np.ndarray): (H, W) view or (T, H, W) stack, e.g. from generate_thermal_views.
+            rng (np.random.Generator): Source of the temporal noise (default is the sensor's own).
+
+        Returns:
+            np.ndarray: uint16 counts of shape (rows, cols), or (T, rows, cols) for a stack.
+        """
+        thermal_views = np.asarray(thermal_views)
+        stack = thermal_views.reshape((-1,) + thermal_views.shape[-2:])
+        row_matrix, col_matrix, padded, transfer, gain, offset = self._setup(stack.shape[-2:])
+        rng = self.rng if rng is None else rng
+        counts = np.empty((len(stack),) + gain.shape, dtype=np.uint16)
+        frame_bytes = max(np.prod(padded or gain.shape), np.prod(stack.shape[1:])) * np.dtype(self.dtype).itemsize
+        chunk = max(int(self.chunk_bytes // frame_bytes), 1)
+
+        for start in range(0, len(stack), chunk):
+            frames = stack[start:start + chunk].astype(self.dtype, copy=False)
+            with instrumentation.span("sensor.resample", frames=len(frames)):
+                if row_matrix is not None:
+                    frames = np.matmul(row_matrix, frames)
+                if col_matrix is not None:
+                    frames = np.matmul(frames, col_matrix)
+            with instrumentation.span("sensor.blur", frames=len(frames)):
+                if transfer is not None:
+                    frames = self._blur(frames, padded, transfer)
+            with instrumentation.span("sensor.noise", frames=len(frames)):
+                frames = frames * gain + offset
+                if self.netd > 0:
+                    frames += self.netd * rng.standard_normal(frames.shape, dtype=self.dtype)
+            with instrumentation.span("sensor.quantize", frames=len(frames)):
+                counts[start:start + len(frames)] = self.quantize(frames)
+        return counts if thermal_views.ndim == 3 else counts[0]
+
+    def quantize(self, values):
+        """Convert thermal values to ADC counts, clipping to value_range."""
+        low, high = self.value_range
+        levels = 2 ** self.bits - 1
+        scaled = (np.asarray(values) - low) * (levels / (high - low))
+        return np.clip(np.rint(scaled), 0, levels).astype(np.uint16)
+
+    def to_values(self, counts):
+        """Convert ADC counts back to the thermal values they stand for."""
+        low, high = self.value_range
+        return low + np.asarray(counts, dtype=self.dtype) * ((high - low) / (2 ** self.bits - 1))
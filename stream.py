@@ -0,0 +1,231 @@
+import os
+import queue
+import threading
+from collections import namedtuple
+import numpy as np
+import instrumentation
+from raster import HOT_LUT
+
+# One simulated moment: hours since midnight of the first day, temperature, (H, W, 3) uint8 RGB view and
+# (H, W) thermal view
+Frame = namedtuple("Frame", ["timestamp", "temperature", "rgb_view", "thermal_view"])
+
+
+def stream_frames(simulation_map, start=0.0, stop=24.0, step_seconds=3600, temperature=None, agents=None,
+                  dtype=np.float64):
+    """
+    Yield the frames of a run lazily, one per timestep from start up to (not including) stop.
+
+    Only the current frame is computed, so a run of any length streams in constant memory. Runs may span
+    several days; the temperature curve is evaluated at the hour of the day.
+
+    Args:
+        simulation_map (MapSimulation): The map to simulate.
+        start, stop (float): Time range, in hours since midnight of the first day.
+        step_seconds (float): Time between frames.
+        temperature (callable): Temperature at an hour of the day (default is get_hourly_temperature).
+        agents (AnimalAgents): Optional moving animals, stepped from frame to frame.
+        dtype: Floating point type of the thermal views (float32 halves their memory).
+
+    Yields:
+        Frame: The views at each timestep. The RGB view is the map's cached view, read-only and shared
+            between frames, unless agents change it, in which case every frame gets its own copy.
+    """
+    if temperature is None:
+        from cano import get_hourly_temperature as temperature
+
+    step_hours = step_seconds / 3600
+    n_frames = int(np.ceil(round((stop - start) / step_hours, 9)))
+    for index in range(n_frames):
+        timestamp = start + index * step_hours
+        # Frames are attributed to their hour of the day, so a profiled hour captures its frames (the last
+        # one, with several frames per hour); the consumer's time between frames stays outside the hour
+        with instrumentation.hour(int(timestamp % 24)), instrumentation.span("stream.frame", timestamp=timestamp):
+            if agents is not None and index:
+                agents.step(step_hours)
+            temp = float(temperature(timestamp % 24))
+            rgb_view = simulation_map.generate_rgb_view()
+            if agents is not None:
+                rgb_view = rgb_view.copy()  # The cached view is patched in place by the next step
+            # A new array per frame rather than the cached view, so that long runs do not churn the cache
+            thermal_view = np.multiply(simulation_map.mean_conductivity(), temp, dtype=dtype)
+        yield Frame(timestamp, temp, rgb_view, thermal_view)
+
+
+def thermal_colors(thermal_view):
+    """Color a thermal view with the 'hot' colormap, normalized to its own min/max like imshow."""
+    low, high = thermal_view.min(), thermal_view.max()
+    normalized = (thermal_view - low) / (high - low) if high > low else np.full(thermal_view.shape, 0.5)
+    return HOT_LUT[np.clip((normalized * len(HOT_LUT)).astype(np.intp), 0, len(HOT_LUT) - 1)]
+
+
+class PNGSink:
+    def __init__(self, directory, scale=1):
+        """
+        Write every frame as a PNG image: the RGB view and the colored thermal view side by side.
+
+        Args:
+            directory (str): Output directory, created if needed.
+            scale (int): Number of pixels along each side of a block.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.scale = scale
+        self.count = 0
+
+    def write(self, frame):
+        from PIL import Image
+
+        image = np.concatenate([frame.rgb_view, thermal_colors(frame.thermal_view)], axis=1)
+        if self.scale > 1:
+            image = image.repeat(self.scale, axis=0).repeat(self.scale, axis=1)
+        Image.fromarray(image).save(os.path.join(self.directory, f"frame_{self.count:06d}.png"))
+        self.count += 1
+
+    def close(self):
+        pass
+
+
+class NPZShardSink:
+    def __init__(self, directory, frames_per_shard=256, compress=True):
+        """
+        Collect frames into fixed-size shards, each written as one .npz file of stacked arrays.
+
+        Each shard holds "timestamps", "temperatures", "rgb" (T, H, W, 3) and "thermal" (T, H, W) arrays, so
+        memory is bounded by one shard whatever the length of the run.
+
+        Args:
+            directory (str): Output directory, created if needed.
+            frames_per_shard (int): Frames per shard; the last one may hold fewer.
+            compress (bool): Whether to compress the shards.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.frames_per_shard = frames_per_shard
+        self.compress = compress
+        self.paths = []
+        self._frames = []
+
+    def write(self, frame):
+        self._frames.append(frame)
+        if len(self._frames) == self.frames_per_shard:
+            self._flush()
+
+    def _flush(self):
+        """Write the collected frames as the next shard."""
+        if not self._frames:
+            return
+        frames, self._frames = self._frames, []
+        path = os.path.join(self.directory, f"shard_{len(self.paths):05d}.npz")
+        save = np.savez_compressed if self.compress else np.savez
+        with open(path, "wb") as f:
+            save(f, timestamps=np.array([frame.timestamp for frame in frames]),
+                 temperatures=np.array([frame.temperature for frame in frames]),
+                 rgb=np.stack([frame.rgb_view for frame in frames]),
+                 thermal=np.stack([frame.thermal_view for frame in frames]))
+        self.paths.append(path)
+
+    def close(self):
+        self._flush()
+
+
+class DisplaySink:
+    # matplotlib windows must be updated from the main thread, so run_stream calls this sink directly
+    threaded = False
+
+    def __init__(self, pause=1e-3):
+        """
+        Show the frames live in a window: the RGB view and the thermal view, updated in place.
+
+        Args:
+            pause (float): Seconds each frame stays on screen.
+        """
+        self.pause = pause
+        self.fig = None
+
+    def write(self, frame):
+        import matplotlib.pyplot as plt
+
+        if self.fig is None:
+            self.fig, (ax_rgb, ax_thermal) = plt.subplots(1, 2, figsize=(12, 6))
+            self.rgb_image = ax_rgb.imshow(frame.rgb_view)
+            self.thermal_image = ax_thermal.imshow(frame.thermal_view, cmap=plt.get_cmap('hot'))
+            self.fig.colorbar(self.thermal_image, ax=ax_thermal, label="Thermal Value (0 to 30)")
+        self.rgb_image.set_data(frame.rgb_view)
+        self.thermal_image.set_data(frame.thermal_view)
+        self.thermal_image.set_clim(frame.thermal_view.min(), frame.thermal_view.max())
+        day, hour = divmod(frame.timestamp, 24)
+        self.fig.suptitle(f"Day {int(day) + 1}, {int(hour):02d}:{int(round(hour % 1 * 60)) % 60:02d}"
+                          f" - {frame.temperature:.1f} degrees")
+        plt.pause(self.pause)
+
+    def close(self):
+        pass
+
+
+def _drain(sink, frames, errors):
+    """Worker thread: hand the queued frames to a sink until the end marker (None) arrives."""
+    frame = True
+    try:
+        while True:
+            frame = frames.get()
+            if frame is None:
+                break
+            with instrumentation.span("stream.sink", sink=type(sink).__name__):
+                sink.write(frame)
+        sink.close()
+    except BaseException as error:  # Reported by run_stream in the main thread
+        errors.append(error)
+        while frame is not None:  # Keep consuming, so the producer never blocks on a dead sink
+            frame = frames.get()
+
+
+def run_stream(frames, sinks, queue_size=4):
+    """
+    Consume a stream of frames with several sinks, overlapping the computation with the sinks' work.
+
+    Every sink runs on its own worker thread and receives the frames through a bounded queue of queue_size
+    frames, so the frames are computed while earlier ones are still being encoded and written (NumPy, zlib
+    and PIL release the GIL for that work), and at most queue_size frames per sink are held in memory. A
+    sink that falls behind makes the computation wait. Sinks with threaded = False, like DisplaySink, are
+    called on the calling thread instead.
+
+    Args:
+        frames (iterable): Frames, e.g. from stream_frames.
+        sinks (list): Objects with write(frame) and close() methods.
+        queue_size (int): Frames that may wait for each threaded sink.
+
+    Returns:
+        int: Number of frames streamed.
+
+    Raises the first exception of any sink, once the stream has stopped.
+    """
+    errors = []
+    workers = []
+    for sink in sinks:
+        if getattr(sink, "threaded", True):
+            sink_queue = queue.Queue(maxsize=queue_size)
+            thread = threading.Thread(target=_drain, args=(sink, sink_queue, errors), daemon=True)
+            thread.start()
+            workers.append((sink_queue, thread))
+    inline = [sink for sink in sinks if not getattr(sink, "threaded", True)]
+
+    count = 0
+    try:
+        for frame in frames:
+            if errors:
+                break
+            for sink_queue, _ in workers:
+                sink_queue.put(frame)
+            for sink in inline:
+                sink.write(frame)
+            count += 1
+    finally:
+        for sink_queue, thread in workers:
+            sink_queue.put(None)
+            thread.join()
+        for sink in inline:
+            sink.close()
+    if errors:
+        raise errors[0]
+    return count
@@ -0,0 +1,186 @@
+import itertools
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import instrumentation
+from items import MATERIALS
+from stream import Frame, NPZShardSink, PNGSink
+
+# One run of the sweep: a name, a weather curve (a callable of the hour of the day, or one temperature per
+# timestep) and the thermal conductivity of some item types, {type name: conductivity}
+Scenario = namedtuple("Scenario", ["name", "temperature", "conductivity"])
+# What a worker hands back for a scenario: the summary of its thermal views and where they were written
+SweepResult = namedtuple("SweepResult", ["scenario", "summary", "path"])
+
+SINKS = {"npz": NPZShardSink, "png": PNGSink}
+
+# Per-process state, set up once by _init_worker in every worker process
+_arrays = None
+_handles = None
+
+def scenario_grid(weather, materials):
+    """
+    Return the scenarios of every combination of a weather curve and a material setting.
+
+    Args:
+        weather (dict): Curve name -> callable of the hour of the day, or sequence of temperatures.
+        materials (dict): Setting name -> {item type name: thermal conductivity} ({} keeps the map's own).
+
+    Returns:
+        list: Scenario objects named "<weather>-<materials>".
+    """
+    return [Scenario(f"{weather_name}-{material_name}", curve, conductivity)
+            for (weather_name, curve), (material_name, conductivity)
+            in itertools.product(weather.items(), materials.items())]
+
+
+def thermal_statistics(thermal_view):
+    """Default per-frame summary of a sweep: the mean, min and max thermal value of the view."""
+    return {"mean": thermal_view.mean(), "min": thermal_view.min(), "max": thermal_view.max()}
+
+
+class SharedArrays:
+    def __init__(self, arrays):
+        """
+        Copy arrays into shared memory blocks that worker processes attach to without copying them.
+
+        Use it as a context manager, or call close, so that the blocks are freed once the workers are done.
+
+        Args:
+            arrays (dict): Name -> np.ndarray.
+        """
+        self.blocks = []
+        self.spec = {}  # Name -> (block name, shape, dtype), all a worker needs to attach
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            self.spec[name] = (block.name, array.shape, array.dtype.str)
+
+    @staticmethod
+    def attach(spec):
+        """
+        Map the arrays of a spec into this process as read-only views.
+
+        Returns:
+            tuple: (arrays, handles); the handles must be kept alive as long as the arrays are used.
+        """
+        arrays, handles = {}, []
+        for name, (block_name, shape, dtype) in spec.items():
+            # Pool workers share the resource tracker of the creating process, so close() alone frees the block
+            block = shared_memory.SharedMemory(name=block_name)
+            array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            array.flags.writeable = False
+            arrays[name] = array
+            handles.append(block)
+        return arrays, handles
+
+    def close(self):
+        """Free the shared memory blocks."""
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+def _init_worker(spec):
+    """Attach the shared layers of the map once in a worker process."""
+    global _arrays, _handles
+    _arrays, _handles = SharedArrays.attach(spec)
+
+
+def _run_scenario(name, hours, temps, conductivity, summarize, output, sink):
+    """Compute the thermal views of one scenario from the shared layers, summarize them and write them out."""
+    # Swap the conductivity of each overridden type into the summed conductivity of the blocks
+    conductivity_sum = _arrays["conductivity_sum"]
+    if conductivity:
+        conductivity_sum = conductivity_sum.copy()
+        for type_name, value in conductivity.items():
+            conductivity_sum -= _arrays[f"{type_name}.conductivity"]
+            conductivity_sum += value * _arrays[f"{type_name}.counts"]
+    mean_conductivity = conductivity_sum / _arrays["item_counts"]
+
+    path = None
+    writer = None
+    if output is not None:
+        path = os.path.join(output, name)
+        writer = SINKS[sink](path)
+    summary = {}
+    # One view at a time, so a worker needs the memory of a single frame whatever the number of timesteps
+    for hour, temp in zip(hours, temps):
+        thermal_view = mean_conductivity * temp
+        for key, value in summarize(thermal_view).items():
+            summary.setdefault(key, []).append(value)
+        if writer is not None:
+            writer.write(Frame(hour, temp, _arrays["rgb"], thermal_view))
+    if writer is not None:
+        writer.close()
+    return {key: np.array(values) for key, values in summary.items()}, path
+
+
+def run_sweep(simulation_map, scenarios, hours=range(24), workers=None, summarize=thermal_statistics, output=None,
+              sink="npz"):
+    """
+    Run every scenario on the same map, fanned out over a process pool that shares the map's layers.
+
+    The layers the scenarios need (summed conductivity, item counts, RGB view, and the count and summed
+    conductivity of every item type whose conductivity a scenario changes) are built once and published
+    through shared memory. Workers attach to them instead of receiving a copy of the map, and only the
+    scenario parameters and the summaries cross process boundaries, so throughput grows with the number of
+    cores until memory bandwidth runs out.
+
+    Args:
+        simulation_map (MapSimulation): The base map.
+        scenarios (list): Scenario objects, e.g. from scenario_grid.
+        hours (sequence): Hours of the day of the timesteps.
+        workers (int): Number of worker processes (default is the number of CPUs).
+        summarize (callable): Module-level function mapping a thermal view to a dict of values; the summary
+            of a scenario holds one array of T values per key.
+        output (str): Optional directory; the views of each scenario are then written by a sink to a
+            subdirectory named after it.
+        sink (str): "npz" for .npz shards of the views (see NPZShardSink), or "png" for images (see PNGSink).
+
+    Returns:
+        list: One SweepResult per scenario, in order.
+    """
+    if sink not in SINKS:
+        raise ValueError(f"sink must be one of {', '.join(SINKS)}, not {sink!r}.")
+    hours = np.asarray(hours, dtype=float)
+    # Weather curves are evaluated here, so that workers only ever receive arrays
+    temps = []
+    for scenario in scenarios:
+        if callable(scenario.temperature):
+            temps.append(np.array([scenario.temperature(hour) for hour in hours], dtype=float))
+        else:
+            temps.append(np.broadcast_to(np.asarray(scenario.temperature, dtype=float), hours.shape))
+    overridden = sorted({type_name for scenario in scenarios for type_name in scenario.conductivity})
+    unknown = [type_name for type_name in overridden if type_name not in MATERIALS]
+    if unknown:
+        raise ValueError(f"Unknown item types: {', '.join(unknown)}.")
+
+    with instrumentation.span("sweep.publish", types=len(overridden)):
+        arrays = {"conductivity_sum": simulation_map.conductivity_sum, "item_counts": simulation_map.item_counts,
+                  "rgb": simulation_map.generate_rgb_view()}
+        for type_name in overridden:
+            arrays[f"{type_name}.counts"], arrays[f"{type_name}.conductivity"] = simulation_map.type_layers(type_name)
+        shared = SharedArrays(arrays)
+        del arrays
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(scenarios)))
+    with shared, instrumentation.span("sweep", workers=workers, scenarios=len(scenarios)), \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared.spec,)) as executor:
+        futures = [executor.submit(_run_scenario, scenario.name, hours, scenario_temps, dict(scenario.conductivity),
+                                   summarize, output, sink)
+                   for scenario, scenario_temps in zip(scenarios, temps)]
+        outcomes = [future.result() for future in futures]
+    return [SweepResult(scenario, summary, path) for scenario, (summary, path) in zip(scenarios, outcomes)]
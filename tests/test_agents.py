@@ -0,0 +1,56 @@
+import numpy as np
+from agents import AnimalAgents
+from items import MATERIALS, Tree
+from map_simulation import MapSimulation
+
+
+def _agents(simulation_map, positions):
+    return AnimalAgents(simulation_map, positions, speed=0, attraction=0, separation=0)
+
+
+def test_edit_block_then_animal_leaves():
+    simulation_map = MapSimulation(6, 5)
+    agents = _agents(simulation_map, [(2, 2)])
+    simulation_map.generate_thermal_view(20)  # Cache the views, so that they are patched afterwards
+    assert tuple(simulation_map.generate_rgb_view()[2, 2]) == MATERIALS["Animal"].color
+
+    simulation_map.add_items_to_block(2, 2, [Tree((2, 2))])  # Rebuilds the block's layers from its items
+    assert tuple(simulation_map.generate_rgb_view()[2, 2]) == MATERIALS["Animal"].color
+    agents.positions[:] = (4.5, 4.5)
+    agents.step(0)
+
+    reference = MapSimulation(6, 5)
+    reference.add_items_to_block(2, 2, [Tree((2, 2))])
+    assert simulation_map.item_counts[2, 2] == 2
+    np.testing.assert_array_equal(simulation_map.generate_rgb_view()[2, 2], reference.generate_rgb_view()[2, 2])
+    np.testing.assert_allclose(simulation_map.generate_thermal_view(20)[2, 2], reference.generate_thermal_view(20)[2, 2])
+    assert np.isfinite(simulation_map.generate_thermal_view(20)).all()
+
+
+def test_animals_stay_out_of_saved_scenes(tmp_path):
+    simulation_map = MapSimulation(6, 5)
+    tree = Tree((1, 1))
+    tree.thermal_conductivity = 3.0  # Unlike the animals, so that they change the mean
+    simulation_map.add_items_to_block(1, 1, [tree])
+    expected_rgb = simulation_map.generate_rgb_view().copy()
+    expected_mean = simulation_map.mean_conductivity().copy()
+    _agents(simulation_map, [(1, 1), (1, 1), (3, 4)])
+    assert simulation_map.mean_conductivity()[1, 1] != expected_mean[1, 1]
+
+    simulation_map.save(str(tmp_path / "scene.npz"))
+    loaded = MapSimulation.load(str(tmp_path / "scene.npz"))
+    assert loaded.item_counts.sum() == 5 * 6 + 1
+    np.testing.assert_array_equal(loaded.generate_rgb_view(), expected_rgb)
+    np.testing.assert_allclose(loaded.mean_conductivity(), expected_mean)
+
+
+def test_remove_restores_the_views():
+    simulation_map = MapSimulation(6, 5)
+    simulation_map.add_items_to_block(1, 1, [Tree((1, 1))])
+    expected_rgb = simulation_map.generate_rgb_view().copy()
+    expected_thermal = simulation_map.generate_thermal_view(20).copy()
+
+    agents = _agents(simulation_map, [(1, 1), (0, 3)])
+    agents.remove()
+    np.testing.assert_array_equal(simulation_map.generate_rgb_view(), expected_rgb)
+    np.testing.assert_allclose(simulation_map.generate_thermal_view(20), expected_thermal)
@@ -0,0 +1,43 @@
+import numpy as np
+from items import House, Pond, Tree
+from map_simulation import MapSimulation
+
+
+def test_edits_only_create_the_items_of_their_block(tmp_path):
+    positions = np.array([(0, 0), (1, 2), (3, 3), (1, 2)])
+    simulation_map = MapSimulation(5, 4)
+    simulation_map.add_items(positions, Tree, on_collision="ignore")
+    simulation_map.add_items_to_block(1, 2, [Tree((1, 2))])
+    simulation_map.modify_item_in_block(1, 2, "Tree", thermal_conductivity=2.0)
+    # The items of the other blocks are still queued
+    assert sum(len(x) for _, x, _, _, _ in simulation_map._pending) == 2
+
+    reference = MapSimulation(5, 4)
+    reference.add_items(positions, Tree, on_collision="ignore")
+    reference.blocks  # Creates every item first, as edits did before
+    reference.add_items_to_block(1, 2, [Tree((1, 2))])
+    reference.modify_item_in_block(1, 2, "Tree", thermal_conductivity=2.0)
+    for name in ("type_ids", "top_colors", "conductivity_sum", "item_counts"):
+        np.testing.assert_array_equal(getattr(simulation_map, name), getattr(reference, name))
+    assert [item.thermal_conductivity for item in simulation_map.blocks[1][2].items] == \
+        [item.thermal_conductivity for item in reference.blocks[1][2].items]
+
+
+def _index_entries(simulation_map):
+    return {item_type: sorted(zip(*(values.tolist() for values in entry)))
+            for item_type, entry in simulation_map._item_index().items() if len(entry[0])}
+
+
+def test_item_index_kept_up_to_date():
+    rng = np.random.default_rng(1)
+    simulation_map = MapSimulation(40, 30)
+    simulation_map.add_items(rng.integers(0, 30, (200, 2)), Tree, on_collision="ignore")
+    simulation_map.select_items(Tree)  # Builds the index, which the edits below update in place
+    simulation_map.add_items(rng.integers(0, 30, (50, 2)), Pond, radius=0.4)
+    list(simulation_map.iter_items((0, 0, 10, 10)))
+    simulation_map.add_items_to_block(5, 5, [House((5, 5))])
+    simulation_map.add_items_to_block(20, 20, [Tree((20, 20))])
+    updated = _index_entries(simulation_map)
+
+    simulation_map._index = None
+    assert updated == _index_entries(simulation_map)
@@ -0,0 +1,45 @@
+import time
+import numpy as np
+from items import House, Road, Tree
+from map_simulation import MapSimulation
+
+
+def _one_by_one(simulation_map, positions, item_type, **params):
+    """Place items one at a time, the behaviour add_items must reproduce in one call."""
+    return np.array([bool(simulation_map.add_items([position], item_type,
+                                                   **{name: values[i] for name, values in params.items()})[0])
+                     for i, position in enumerate(positions)])
+
+
+def test_long_overlap_chain():
+    # Every road overlaps the next one, so the vectorized rounds only settle the start of the chain
+    n = 100_000
+    simulation_map = MapSimulation(n + 1, 1, sparse=True)
+    start = time.perf_counter()
+    accepted = simulation_map.add_items(np.stack([np.zeros(n, dtype=int), np.arange(n)], axis=1), Road, width=2)
+    assert time.perf_counter() - start < 5  # Took minutes with one round per pair of items
+    np.testing.assert_array_equal(accepted, np.arange(n) % 2 == 0)
+
+
+def test_matches_one_by_one_placement():
+    rng = np.random.default_rng(0)
+    trees = rng.integers(0, 12, (300, 2))
+    radius = rng.choice([0.4, 1.0, 1.5], len(trees))
+    roads = rng.integers(0, 12, (200, 2))
+    widths = rng.integers(1, 5, len(roads))
+    simulation_map, reference = MapSimulation(12, 12), MapSimulation(12, 12)
+    for placing in (simulation_map, reference):
+        placing.add_items([(0, 0), (5, 5)], House, width=2, length=1)  # Blocks covered before the batches
+
+    np.testing.assert_array_equal(simulation_map.add_items(trees, Tree, radius=radius),
+                                  _one_by_one(reference, trees, Tree, radius=radius))
+    np.testing.assert_array_equal(simulation_map.add_items(roads, Road, width=widths),
+                                  _one_by_one(reference, roads, Road, width=widths))
+
+
+def test_resized_house_marks_its_new_footprint():
+    simulation_map = MapSimulation(12, 8)
+    simulation_map.add_items([(5, 1)], House, width=3, length=2)
+    simulation_map.modify_item_in_block(5, 1, "House", size=(8, 3))
+    # (3, 7) and (5, 6) are only covered by the resized house
+    np.testing.assert_array_equal(simulation_map.add_items([(3, 7), (5, 6), (6, 1)], Tree), [False, False, True])
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from items import Tree
+from map_simulation import MapSimulation
+from procedural import generate_map
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+@pytest.mark.parametrize("extension", [".npz", ".json"])
+def test_empty_map_round_trip(tmp_path, sparse, extension):
+    path = str(tmp_path / f"empty{extension}")
+    MapSimulation(7, 4, sparse=sparse).save(path)
+    loaded = MapSimulation.load(path)
+    assert (loaded.width, loaded.height, loaded.sparse) == (7, 4, sparse)
+    assert list(loaded.iter_items()) == []
+    np.testing.assert_array_equal(loaded.generate_rgb_view(), MapSimulation(7, 4).generate_rgb_view())
+    loaded.add_items_to_block(2, 3, [Tree((2, 3))])  # The loaded map can still be edited
+    assert loaded.item_counts[2, 3] == 2
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+@pytest.mark.parametrize("extension", [".npz", ".json"])
+def test_edited_grass_round_trip(tmp_path, sparse, extension):
+    path = str(tmp_path / f"grass{extension}")
+    simulation_map = MapSimulation(7, 4, sparse=sparse)
+    simulation_map.add_items([(1, 2), (3, 5)], Tree)
+    simulation_map.modify_item_in_block(1, 2, "Grass", thermal_conductivity=3.0)  # Under a tree
+    simulation_map.modify_item_in_block(0, 0, "Grass", thermal_conductivity=3.0, color=(200, 200, 0))
+    simulation_map.save(path)
+
+    loaded = MapSimulation.load(path)
+    np.testing.assert_array_equal(loaded.generate_rgb_view(), simulation_map.generate_rgb_view())
+    np.testing.assert_allclose(loaded.conductivity_sum, simulation_map.conductivity_sum)
+    # The loaded grass items hold the edits, so rebuilding a block from its items keeps them
+    for x, y in [(1, 2), (0, 0)]:
+        loaded.add_items_to_block(x, y, [Tree((x, y))])
+        assert loaded.conductivity_sum[x, y] == 3.0 + loaded.item_counts[x, y] - 1
+    assert loaded.blocks[0][0].items[0].color == (200, 200, 0)
+
+
+def _items(simulation_map):
+    return sorted((x, y, item.name, item.thermal_conductivity, tuple(item.color))
+                  for x, y, item in simulation_map.iter_items())
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+@pytest.mark.parametrize("extension", [".npz", ".json"])
+def test_round_trip(tmp_path, sparse, extension):
+    path = str(tmp_path / f"scene{extension}")
+    simulation_map = generate_map(40, 30, seed=2, sparse=sparse)
+    list(simulation_map.iter_items((0, 0, 10, 10)))  # Some blocks created, the others still queued
+    simulation_map.add_items_to_block(20, 20, [Tree((20, 20))])
+    simulation_map.modify_item_in_block(20, 20, "Tree", thermal_conductivity=2.0)
+    simulation_map.modify_items(Tree, region=(0, 0, 20, 20), color=(1, 2, 3))
+    simulation_map.save(path)
+
+    loaded = MapSimulation.load(path)
+    assert _items(loaded) == _items(simulation_map)
+    for name in ("type_ids", "top_colors", "conductivity_sum", "item_counts"):
+        np.testing.assert_allclose(getattr(loaded, name), getattr(simulation_map, name))
+    np.testing.assert_array_equal(loaded.occupancy.as_array(), simulation_map.occupancy.as_array())
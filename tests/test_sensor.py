@@ -0,0 +1,11 @@
+import numpy as np
+from sensor import ThermalSensor
+
+
+def test_uniform_field_stays_uniform():
+    # Without noise, neither the resampling nor the edge-padded blur may create structure in a flat scene
+    sensor = ThermalSensor(resolution=(12, 20), psf_sigma=1.5, netd=0, fixed_pattern_offset=0, fixed_pattern_gain=0)
+    views = np.full((3, 36, 50), 25.0)
+    counts = sensor.capture(views)
+    assert counts.shape == (3, 12, 20)
+    np.testing.assert_array_equal(counts, sensor.quantize(25.0))
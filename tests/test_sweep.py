@@ -0,0 +1,27 @@
+import numpy as np
+from items import Tree
+from map_simulation import MapSimulation
+from sweep import Scenario, run_sweep
+
+
+def _edited_map(grass_conductivity):
+    simulation_map = MapSimulation(5, 4)
+    simulation_map.add_items_to_block(1, 1, [Tree((1, 1))])
+    simulation_map.add_items([(3, 2), (0, 4)], Tree, thermal_conductivity=2.5)
+    for x, y in grass_conductivity:
+        simulation_map.modify_item_in_block(x, y, "Grass", thermal_conductivity=grass_conductivity[x, y])
+    return simulation_map
+
+
+def test_grass_override_on_edited_grass():
+    simulation_map = _edited_map({(1, 1): 3.0, (2, 0): 0.5})
+    counts, conductivity = simulation_map.type_layers("Grass")
+    np.testing.assert_array_equal(counts, np.ones((4, 5)))
+    assert conductivity[1, 1] == 3.0 and conductivity[2, 0] == 0.5 and conductivity[0, 0] == 1.0
+
+    temps = [10.0, 25.0]
+    [result] = run_sweep(simulation_map, [Scenario("grass", temps, {"Grass": 2.0})], hours=range(2), workers=1)
+    rebuilt = _edited_map({(x, y): 2.0 for x in range(4) for y in range(5)})
+    views = rebuilt.generate_thermal_views(temps)
+    np.testing.assert_allclose(result.summary["mean"], views.mean(axis=(1, 2)))
+    np.testing.assert_allclose(result.summary["max"], views.max(axis=(1, 2)))
@@ -0,0 +1,16 @@
+import numpy as np
+from cano import get_hourly_temperature
+from procedural import generate_map
+from thermal import HeatDiffusionModel
+
+
+def test_adi_is_stable_at_large_timesteps():
+    model = HeatDiffusionModel(generate_map(24, 18, seed=3))
+    hours = np.arange(24)
+    reference = model.run(hours, get_hourly_temperature, dt=60)
+    # Hour-long steps stay close to minute-long ones
+    assert np.abs(model.run(hours, get_hourly_temperature, dt=3600) - reference).max() < 0.5
+    # Six-hour steps, far beyond the explicit limit, stay bounded by the range of the accurate run
+    coarse = model.run(hours[::6], get_hourly_temperature, dt=6 * 3600)
+    assert np.isfinite(coarse).all()
+    assert reference.min() - 1 < coarse.min() and coarse.max() < reference.max() + 1
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from items import House, Pond, Tree
+from map_simulation import MapSimulation
+from palette import GRASS_BACKGROUND
+from procedural import generate_map
+from raster import MapRasterizer
+from view_cache import ViewCache
+
+
+def _scene(sparse):
+    """A generated map with stacked items and per-item conductivities, so that every block view differs."""
+    simulation_map = generate_map(24, 18, seed=3, sparse=sparse)
+    rng = np.random.default_rng(3)
+    simulation_map.add_items(rng.integers(0, 18, (60, 2)), Tree, on_collision="ignore",
+                             thermal_conductivity=rng.uniform(0.5, 3.0, 60))
+    return simulation_map
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_layer_views_match_the_blocks(sparse):
+    simulation_map = _scene(sparse)
+    rgb = simulation_map.generate_rgb_view()
+    thermal = simulation_map.generate_thermal_view(20)
+    for x, row in enumerate(simulation_map.blocks):
+        for y, block in enumerate(row):
+            assert tuple(rgb[x, y]) == tuple(block.get_rgb())
+            assert thermal[x, y] == pytest.approx(block.get_thermal(20))
+
+
+def test_sparse_views_match_dense():
+    dense, sparse = _scene(False), _scene(True)
+    np.testing.assert_array_equal(sparse.generate_rgb_view(), dense.generate_rgb_view())
+    np.testing.assert_allclose(sparse.generate_thermal_view(20), dense.generate_thermal_view(20))
+    for name in ("type_ids", "top_colors", "conductivity_sum", "item_counts"):
+        np.testing.assert_array_equal(getattr(sparse, name), getattr(dense, name))
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_patched_views_match_a_full_recompute(sparse):
+    simulation_map = _scene(sparse)
+    simulation_map.generate_rgb_view()
+    simulation_map.generate_thermal_view(20)  # Cache the views, so that the edits below patch them
+
+    simulation_map.add_items_to_block(4, 5, [House((4, 5))])
+    simulation_map.modify_item_in_block(4, 5, "House", thermal_conductivity=2.5, color=(10, 20, 30))
+    simulation_map.add_items([(1, 1), (10, 20)], Pond, radius=0.4, on_collision="ignore")
+    simulation_map.modify_items(Tree, region=(0, 0, 9, 12), thermal_conductivity=0.2)
+
+    full = ViewCache(simulation_map.layers)
+    np.testing.assert_array_equal(simulation_map.generate_rgb_view(), full.rgb())
+    np.testing.assert_allclose(simulation_map.generate_thermal_view(20), full.thermal(20))
+
+
+def test_rasterizer_matches_the_rgb_view_at_scale_1():
+    simulation_map = MapSimulation(12, 10)
+    # Shapes that fit in their block, on blocks far enough apart that none overlaps another
+    simulation_map.add_items([(1, 1), (5, 7)], Tree, radius=0.4)
+    simulation_map.add_items([(3, 2), (8, 9)], House, width=1, length=1)
+    simulation_map.add_items([(6, 3)], Pond, radius=0.4)
+
+    expected = simulation_map.generate_rgb_view().copy()
+    expected[simulation_map.item_counts == 1] = GRASS_BACKGROUND  # The rasterizer draws grass as the background
+    # At noon the day/night brightness is 1, so items have the color of their material
+    np.testing.assert_array_equal(MapRasterizer(simulation_map, scale=1).rgb(12), expected)
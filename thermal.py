@@ -0,0 +1,171 @@
+import numpy as np
+from items import Item
+
+def solar_flux(hour, peak=800.0):
+    """Return the incoming sunlight in W/m^2 at the given hour(s): a half sine between 6 AM and 6 PM."""
+    hour = np.mod(np.asarray(hour, dtype=float), 24)
+    return peak * np.clip(np.sin(np.pi * (hour - 6) / 12), 0, None)
+
+def material_layers(simulation_map):
+    """
+    Return the per-block heat capacity, heat conductivity and solar absorption as 2D arrays.
+
+    Like Block.get_thermal, each block takes the average over all its items, its grass included.
+    """
+    layers = [np.full((simulation_map.height, simulation_map.width), getattr(Item, name))
+              for name in ("heat_capacity", "heat_conductivity", "solar_absorption")]
+    for x, y, item in simulation_map.iter_items():
+        layers[0][x, y] += item.heat_capacity
+        layers[1][x, y] += item.heat_conductivity
+        layers[2][x, y] += item.solar_absorption
+    return [layer / simulation_map.item_counts for layer in layers]
+
+
+class _TridiagonalSolver:
+    def __init__(self, lower, diagonal, upper):
+        """
+        Thomas algorithm for a batch of tridiagonal systems that do not change between solves.
+
+        Equation i of every system lives along the first axis, so each elimination step is one vectorized
+        operation over all systems. The forward elimination factors are computed once here.
+        """
+        n = len(diagonal)
+        self.lower = lower
+        self.upper_prime = np.empty_like(diagonal)
+        self.inverse_pivot = np.empty_like(diagonal)
+        self.inverse_pivot[0] = 1 / diagonal[0]
+        self.upper_prime[0] = upper[0] * self.inverse_pivot[0]
+        for i in range(1, n):
+            self.inverse_pivot[i] = 1 / (diagonal[i] - lower[i] * self.upper_prime[i - 1])
+            self.upper_prime[i] = upper[i] * self.inverse_pivot[i]
+
+    def solve(self, rhs):
+        """Solve all systems for the right-hand sides rhs, in place, and return the solution."""
+        scratch = np.empty_like(rhs[0])
+        rhs[0] *= self.inverse_pivot[0]
+        for i in range(1, len(rhs)):
+            np.multiply(self.lower[i], rhs[i - 1], out=scratch)
+            rhs[i] -= scratch
+            rhs[i] *= self.inverse_pivot[i]
+        for i in range(len(rhs) - 2, -1, -1):
+            np.multiply(self.upper_prime[i], rhs[i + 1], out=scratch)
+            rhs[i] -= scratch
+        return rhs
+
+
+def _face_conductance(conductivity, axis):
+    """Return the conductance between neighbouring blocks along an axis (the two blocks in series)."""
+    a, b = np.moveaxis(conductivity, axis, 0)[:-1], np.moveaxis(conductivity, axis, 0)[1:]
+    return np.moveaxis(2 * a * b / (a + b), 0, axis)
+
+def _apply_laplacian(temperature, faces, out, axis):
+    """Add the net heat flowing into each block from its neighbours along an axis to out."""
+    if axis == 0:
+        flux = faces * (temperature[1:] - temperature[:-1])
+        out[:-1] += flux
+        out[1:] -= flux
+    else:
+        flux = faces * (temperature[:, 1:] - temperature[:, :-1])
+        out[:, :-1] += flux
+        out[:, 1:] -= flux
+    return out
+
+
+class HeatDiffusionModel:
+    def __init__(self, simulation_map, exchange_coefficient=20.0, peak_solar=800.0, dtype=np.float64):
+        """
+        Physical thermal engine: a 2D heat equation with thermal inertia, solved on the map grid.
+
+        Every block has the average heat capacity C, conductance K and solar absorption a of its items and
+        follows
+
+            C dT/dt = div(K grad T) + a S(t) - h (T - T_air(t))
+
+        with no heat flowing across the map border. The equation is integrated with the Peaceman-Rachford
+        ADI scheme, which is unconditionally stable, so large timesteps can be used. Each half step is one
+        batched tridiagonal solve along the rows or the columns.
+
+        Args:
+            simulation_map (MapSimulation): The map whose items define the materials.
+            exchange_coefficient (float): Heat exchange with the air h, in W/(m^2 K).
+            peak_solar (float): Sunlight at noon, in W/m^2.
+            dtype: Floating point type of the solver (float32 halves memory traffic on large maps).
+        """
+        self.exchange_coefficient = exchange_coefficient
+        self.peak_solar = peak_solar
+        self.dtype = dtype
+        capacity, conductivity, absorption = material_layers(simulation_map)
+        self.heat_capacity = capacity.astype(dtype)
+        self.solar_absorption = absorption.astype(dtype)
+        self.row_faces = _face_conductance(conductivity, 0).astype(dtype)  # Between blocks x and x + 1
+        self.column_faces = _face_conductance(conductivity, 1).astype(dtype)  # Between blocks y and y + 1
+        self._dt = None
+
+    def _factorize(self, dt):
+        """Build the implicit operators of both ADI half steps for the timestep dt (in seconds)."""
+        self._dt = dt
+        self._explicit_diagonal = self.heat_capacity / (dt / 2) - self.exchange_coefficient / 2
+        self._row_solver = self._implicit_solver(self.heat_capacity, self.row_faces, dt)
+        # Column systems are solved on transposed copies, so that each elimination step reads contiguous memory
+        self._column_solver = self._implicit_solver(self.heat_capacity.T, self.column_faces.T, dt)
+
+    def _implicit_solver(self, capacity, faces, dt):
+        """Factorize (C / (dt/2) + h/2 - L) along the first axis, L being the conduction operator."""
+        lower = np.zeros_like(capacity)
+        upper = np.zeros_like(capacity)
+        lower[1:] = -faces
+        upper[:-1] = -faces
+        diagonal = capacity / (dt / 2) + self.exchange_coefficient / 2 - lower - upper
+        return _TridiagonalSolver(lower, diagonal, upper)
+
+    def _forcing(self, hour, air_temperature):
+        """Return the heat gained from sunlight plus the air term h T_air at the given hour."""
+        solar = float(solar_flux(hour, self.peak_solar))
+        air = float(air_temperature(hour % 24))
+        return self.solar_absorption * solar + self.exchange_coefficient * air
+
+    def step(self, temperature, hour, dt, air_temperature):
+        """Advance the block temperatures by dt seconds from the given hour and return them."""
+        if dt != self._dt:
+            self._factorize(dt)
+        forcing = self._forcing(hour + dt / 7200, air_temperature)  # Evaluated at mid-step
+
+        # First half step: implicit along the rows, explicit along the columns
+        rhs = self._explicit_diagonal * temperature + forcing
+        _apply_laplacian(temperature, self.column_faces, rhs, axis=1)
+        half = self._row_solver.solve(rhs)
+
+        # Second half step: implicit along the columns, explicit along the rows
+        rhs = self._explicit_diagonal * half + forcing
+        _apply_laplacian(half, self.row_faces, rhs, axis=0)
+        rhs = np.ascontiguousarray(rhs.T)
+        return np.ascontiguousarray(self._column_solver.solve(rhs).T)
+
+    def run(self, hours, air_temperature, dt=60.0, spinup_days=1):
+        """
+        Simulate the block temperatures and return them at the requested hours.
+
+        Args:
+            hours (array-like): Increasing output times, in (fractional) hours.
+            air_temperature (callable): Air temperature at an hour of the day, e.g. cano.get_hourly_temperature.
+            dt (float): Longest solver timestep in seconds; each interval between output times is split into
+                equal steps no longer than dt.
+            spinup_days (int): Days simulated before hours[0], starting from the air temperature, so that the
+                result no longer depends on the initial state.
+
+        Returns:
+            np.ndarray: Array of shape (T, height, width) of surface temperatures, like generate_thermal_views.
+        """
+        hours = np.asarray(hours, dtype=float).reshape(-1)
+        views = np.empty((len(hours),) + self.heat_capacity.shape, dtype=self.dtype)
+        hour = hours[0] - 24 * spinup_days
+        temperature = np.full(self.heat_capacity.shape, air_temperature(hour % 24), dtype=self.dtype)
+        for index, target in enumerate(hours):
+            interval = (target - hour) * 3600
+            n_steps = int(np.ceil(interval / dt - 1e-9))
+            step = round(interval / max(n_steps, 1), 6)  # Rounded so equal intervals reuse the factorization
+            for n in range(n_steps):
+                temperature = self.step(temperature, hour + n * step / 3600, step, air_temperature)
+            hour = target
+            views[index] = temperature
+        return views
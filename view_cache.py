@@ -0,0 +1,176 @@
+from collections import OrderedDict
+import numpy as np
+from lod import LODPyramid
+
+def _read_only(array):
+    """Return a view of array that cannot be written to."""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class BlockOverlay:
+    def __init__(self, color, thermal_conductivity):
+        """
+        Items drawn over the views of a map without being part of its layers, such as moving animals.
+
+        Each block holds a number of the overlay's items, which add their conductivity to the block's mean
+        and are its top item in the RGB view. The layers, and so the scene files saved from them, only ever
+        hold the map's own items, so edits that rebuild a block from its items never lose the overlay.
+
+        Args:
+            color (tuple): RGB color of the items.
+            thermal_conductivity (float): Thermal conductivity of each item.
+        """
+        self.color = color
+        self.thermal_conductivity = thermal_conductivity
+        self.keys = np.empty(0, dtype=np.int64)  # Sorted flat indices of the blocks holding items
+        self.counts = np.empty(0, dtype=np.int64)  # Number of items in each of those blocks
+
+    def counts_at(self, keys):
+        """Return the number of items in the blocks at the flat indices keys."""
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=np.int64)
+        found = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[found] == keys, self.counts[found], 0)
+
+
+class ViewCache:
+    def __init__(self, layers, max_thermal_views=24):
+        """
+        Cached RGB, mean-conductivity and thermal views of a map, patched block by block after edits.
+
+        Edits mark the blocks they change with mark, and the next request only recomputes those blocks, so
+        re-rendering after a small edit costs O(changed blocks) instead of O(map). Thermal views are kept per
+        temperature in a bounded LRU and patched the same way.
+
+        The views are returned as read-only arrays shared with the cache, and are patched in place by the next
+        request after an edit; copy them to keep a snapshot or to modify them.
+
+        Args:
+            layers (DenseLayers | SparseLayers): The layers of the map.
+            max_thermal_views (int): Number of temperatures whose thermal view is kept.
+        """
+        self.layers = layers
+        self.max_thermal_views = max_thermal_views
+        self.overlays = []  # BlockOverlay objects added over the layers in every view
+        self.clear()
+
+    def __getstate__(self):
+        # The cached views are not sent along when the map is pickled, e.g. to worker processes
+        return {"layers": self.layers, "max_thermal_views": self.max_thermal_views, "overlays": self.overlays}
+
+    def __setstate__(self, state):
+        self.__init__(state["layers"], state["max_thermal_views"])
+        self.overlays = state["overlays"]
+
+    def add_overlay(self, overlay):
+        """Draw a BlockOverlay over the views from now on; mark its blocks whenever its items change."""
+        self.overlays.append(overlay)
+        self.clear()
+
+    def remove_overlay(self, overlay):
+        """Stop drawing a BlockOverlay over the views."""
+        self.overlays.remove(overlay)
+        self.clear()
+
+    def clear(self):
+        """Drop all cached views; they are rebuilt on the next request."""
+        self._rgb = None
+        self._mean = None
+        self._thermal = OrderedDict()  # Temperature -> thermal view, least recently used first
+        self._lod = None  # LODPyramid of the current views
+        self._dirty = []  # (x, y) coordinate arrays of the blocks changed since the views were last patched
+        self._n_dirty = 0  # Number of dirty blocks, or -1 when the whole map is dirty
+
+    def mark(self, x, y):
+        """Mark the blocks at (x, y), scalars or coordinate arrays, as changed."""
+        self._lod = None  # The pyramid is rebuilt rather than patched
+        if self._rgb is None and self._mean is None:
+            return  # Nothing cached yet, so nothing to patch
+        if self._n_dirty < 0:
+            return
+        x, y = np.atleast_1d(x), np.atleast_1d(y)
+        self._dirty.append((x, y))
+        self._n_dirty += len(x)
+        if self._n_dirty > self.layers.shape[0] * self.layers.shape[1] // 4:
+            self._dirty = []  # Recomputing whole views is cheaper than patching most of the map
+            self._n_dirty = -1
+
+    def _patch(self):
+        """Recompute the dirty blocks of every cached view, in place."""
+        if self._n_dirty < 0:
+            index = (slice(None), slice(None))
+            top_colors, mean = self._full_views()
+        elif self._dirty:
+            index = (np.concatenate([x for x, _ in self._dirty]), np.concatenate([y for _, y in self._dirty]))
+            top_colors = self.layers.values("top_colors", *index)
+            conductivity_sum = self.layers.values("conductivity_sum", *index)
+            item_counts = self.layers.values("item_counts", *index)
+            if self.overlays:
+                keys = index[0].astype(np.int64) * self.layers.shape[1] + index[1]
+                for overlay in self.overlays:
+                    counts = overlay.counts_at(keys)
+                    conductivity_sum = conductivity_sum + counts * overlay.thermal_conductivity
+                    item_counts = item_counts + counts
+                    top_colors[counts > 0] = overlay.color
+            mean = conductivity_sum / item_counts
+        else:
+            return
+        self._dirty = []
+        self._n_dirty = 0
+        if self._rgb is not None:
+            self._rgb[index] = top_colors
+        if self._mean is not None:
+            self._mean[index] = mean
+            for temp, view in self._thermal.items():
+                view[index] = temp * mean
+
+    def _full_views(self):
+        """Return the top colors and mean conductivity of every block, with the overlays drawn over the layers."""
+        if not self.overlays:
+            return self.layers.layer("top_colors"), self.layers.layer("conductivity_sum") / self.layers.layer("item_counts")
+        top_colors = self.layers.layer("top_colors", copy=True)
+        conductivity_sum = self.layers.layer("conductivity_sum", copy=True)
+        item_counts = self.layers.layer("item_counts", copy=True)
+        width = self.layers.shape[1]
+        for overlay in self.overlays:
+            x, y = overlay.keys // width, overlay.keys % width
+            conductivity_sum[x, y] += overlay.counts * overlay.thermal_conductivity
+            item_counts[x, y] += overlay.counts
+            top_colors[x, y] = overlay.color
+        return top_colors, conductivity_sum / item_counts
+
+    def rgb(self):
+        """Return the color of the top item of every block, as a read-only (height, width, 3) uint8 array."""
+        if self._rgb is None:
+            # Without overlays the view can be the layer itself, which the patches keep equal to it
+            self._rgb = self._full_views()[0] if self.overlays else self.layers.layer("top_colors", copy=False)
+        self._patch()
+        return _read_only(self._rgb)
+
+    def mean_conductivity(self):
+        """Return the average thermal conductivity of the items of every block, as a read-only array."""
+        if self._mean is None:
+            self._mean = self._full_views()[1]
+        self._patch()
+        return _read_only(self._mean)
+
+    def thermal(self, temp):
+        """Return the thermal view at a temperature, as a read-only array, reusing it if it is cached."""
+        temp = float(temp)
+        mean = self.mean_conductivity()
+        view = self._thermal.get(temp)
+        if view is None:
+            view = self._thermal[temp] = temp * mean
+            if len(self._thermal) > self.max_thermal_views:
+                self._thermal.popitem(last=False)
+        else:
+            self._thermal.move_to_end(temp)
+        return _read_only(view)
+
+    def lod_pyramid(self, min_size=64):
+        """Return the level-of-detail pyramid of the current views, building it if the map changed since."""
+        if self._lod is None or self._lod.min_size != min_size:
+            self._lod = LODPyramid(self.rgb(), self.mean_conductivity(), self.layers.layer("type_ids"), min_size)
+        return self._lod
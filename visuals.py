@@ -1,135 +1,387 @@
 import matplotlib.pyplot as plt
 import numpy as np
+import instrumentation
+from matplotlib.collections import EllipseCollection, PatchCollection
 from matplotlib.patches import Rectangle, Circle, Arc
+from palette import DRAW_ORDER, GRASS_BACKGROUND, ROAD_THERMAL_ALPHA, normalize_color, rgb_item_color, thermal_item_color
 
-def normalize_color(color):
-    """Convert RGB values from the 0-255 range to the 0-1 range for plotting."""
-    return tuple(c / 255.0 for c in color)
+# Blocks around a viewport that are also visited, so that items anchored outside it but reaching into it
+# (houses and roads span several blocks) are drawn
+VIEWPORT_MARGIN = 16
+# Axes spanning more blocks than this get matplotlib's automatic ticks instead of a tick every 5 blocks
+MAX_TICKED_BLOCKS = 200
 
-def plot_map_rgb(map_rgb_view, map_blocks, hour, title="RGB Map View", ax=None):
-    if ax is None:
-        fig, ax = plt.subplots(figsize=(10, 10))
+def item_patch(item, i, j, n_rows, **kwargs):
+    """
+    Build the patch drawing an item of the block at row i, column j.
 
-    # Brightness factor simulates day/night effect, higher during the day and lower at night
-    brightness_factor = np.sin(np.pi * hour / 24)
+    Trees, ponds and animals are circles, houses and roads are rectangles. Returns None for
+    item types that are not drawn (grass, lakes and unknown items).
+    """
+    if item.name == "Tree":
+        return Circle((j + 0.5, n_rows - i - 0.5), radius=item.radius, **kwargs)
+    elif item.name == "House":
+        return Rectangle((j, n_rows - i - 1), item.width, item.length, **kwargs)
+    elif item.name == "Road":
+        return Rectangle((j - 0.5, n_rows - i - 1.5), item.width, 1, **kwargs)
+    elif item.name == "Pond":
+        return Circle((j + 0.5, n_rows - i - 0.5), radius=item.radius, **kwargs)
+    elif item.name == "Animal":
+        return Circle((j + 0.5, n_rows - i - 0.5), radius=0.15, **kwargs)
+    return None
 
-    # Predefined colors for common item types on the map
-    default_colors = {
-        "Tree": (0, 100, 0),     # Dark Green for trees
-        "House": (139, 69, 19),  # Brown for houses
-        "Road": (128, 128, 128), # Gray for roads
-        "Pond": (0, 0, 255),     # Blue for ponds
-        "Animal": (255, 0, 0),   # Red for animals
-    }
+def _configure_axes(ax, n_rows, n_cols, viewport=None):
+    """Set the ticks, limits and aspect of a map axis, showing the whole map or the blocks of a viewport."""
+    x0, y0, x1, y1 = (0, 0, n_rows, n_cols) if viewport is None else viewport
+    if y1 - y0 <= MAX_TICKED_BLOCKS and x1 - x0 <= MAX_TICKED_BLOCKS:
+        ax.set_xticks(np.arange(y0, y1, step=5))
+        ax.set_yticks(np.arange(n_rows - x1, n_rows - x0, step=5))
+    ax.set_xlim(y0, y1)
+    ax.set_ylim(n_rows - x1, n_rows - x0)
+    ax.set_aspect('equal')
+    ax.grid(False)
 
-    # Set a light green background to represent grass or open land
-    ax.set_facecolor(normalize_color((144, 238, 144)))
+def _window(viewport, n_rows, n_cols, margin=0):
+    """Clip a viewport (x0, y0, x1, y1), widened by margin blocks on every side, to the map."""
+    x0, y0, x1, y1 = viewport
+    return max(x0 - margin, 0), max(y0 - margin, 0), min(x1 + margin, n_rows), min(y1 + margin, n_cols)
 
-    # Iterate over each block and plot its items based on their type
-    for i, row in enumerate(map_blocks):
-        for j, block in enumerate(row):
-            for item in block.items:
-                # Determine the item's base color from predefined mappings or default to white
-                base_color = np.array(default_colors.get(item.name, [255, 255, 255])) / 255.0
+def _iter_blocks(map_blocks, viewport=None, margin=VIEWPORT_MARGIN):
+    """
+    Yield (i, j, block) for the blocks of map_blocks, or only for those of a viewport widened by margin.
 
-                # Adjust brightness based on the time of day
-                adjusted_color = base_color * brightness_factor
+    Blocks of a sparse grid that are not stored are skipped in a viewport, as they only hold grass.
+    """
+    if viewport is None:
+        for i, row in enumerate(map_blocks):
+            for j, block in enumerate(row):
+                yield i, j, block
+        return
+    x0, y0, x1, y1 = _window(viewport, len(map_blocks), len(map_blocks[0]), margin)
+    cells = getattr(map_blocks, "cells", None)  # Stored blocks of a SparseBlockGrid
+    for i in range(x0, x1):
+        if cells is None:
+            row = map_blocks[i]
+            for j in range(y0, y1):
+                yield i, j, row[j]
+        else:
+            for j in range(y0, y1):
+                block = cells.get((i, j))
+                if block is not None:
+                    yield i, j, block
 
-                # Ensure color values remain within the valid range (0-1)
-                adjusted_color = np.clip(adjusted_color, 0, 1)
+def plot_map_rgb(map_rgb_view, map_blocks, hour, title="RGB Map View", ax=None, viewport=None):
+    """
+    Plot the items of the map as shapes on a grass background.
 
+    With a viewport (x0, y0, x1, y1), only the blocks with x0 <= x < x1 and y0 <= y < y1 (as in
+    map_blocks[x][y]), plus a margin of VIEWPORT_MARGIN blocks, are visited, and the axes show that window.
+    """
+    if viewport is not None:
+        viewport = _window(viewport, *map_rgb_view.shape[:2])
+    if ax is None:
+        with instrumentation.span("plot_map_rgb.figure"):
+            fig, ax = plt.subplots(figsize=(10, 10))
+
+    # Set a light green background to represent grass or open land
+    ax.set_facecolor(normalize_color(GRASS_BACKGROUND))
+
+    # Iterate over each block and plot its items based on their type
+    cells = drawn = 0
+    with instrumentation.span("plot_map_rgb.patches"):
+        for i, j, block in _iter_blocks(map_blocks, viewport):
+            cells += 1
+            for item in block.items:
                 # Plot different shapes based on the item type (e.g., trees as circles, houses as rectangles)
-                if item.name == "Tree":
-                    circle = Circle((j + 0.5, map_rgb_view.shape[0] - i - 0.5), radius=item.radius, color=adjusted_color)
-                    ax.add_patch(circle)
-                elif item.name == "House":
-                    rect = Rectangle((j, map_rgb_view.shape[0] - i - 1), item.width, item.length, color=adjusted_color)
-                    ax.add_patch(rect)
-                elif item.name == "Road":
-                    rect = Rectangle((j - 0.5, map_rgb_view.shape[0] - i - 1.5), item.width, 1, color=adjusted_color)
-                    ax.add_patch(rect)
-                elif item.name == "Pond":
-                    circle = Circle((j + 0.5, map_rgb_view.shape[0] - i - 0.5), radius=item.radius, color=normalize_color((0, 0, 255)))
-                    ax.add_patch(circle)
-                elif item.name == "Animal":
-                    circle = Circle((j + 0.5, map_rgb_view.shape[0] - i - 0.5), radius=0.15, color=adjusted_color)
-                    ax.add_patch(circle)
+                patch = item_patch(item, i, j, map_rgb_view.shape[0], color=rgb_item_color(item.name, hour))
+                if patch is not None:
+                    ax.add_patch(patch)
+                    drawn += 1
+    instrumentation.count("cells_visited", cells)
+    instrumentation.count("items_drawn", drawn)
 
     # Set plot title and axis limits to match the map size
     ax.set_title(title)
-    ax.set_xticks(np.arange(0, map_rgb_view.shape[1], step=5))
-    ax.set_yticks(np.arange(0, map_rgb_view.shape[0], step=5))
-    ax.set_xlim(0, map_rgb_view.shape[1])
-    ax.set_ylim(0, map_rgb_view.shape[0])
-    ax.set_aspect('equal')
-    ax.grid(False)
+    _configure_axes(ax, *map_rgb_view.shape[:2], viewport=viewport)
 
 
-def plot_map_thermal(map_thermal_view, map_blocks, hour, title="Thermal Map View", ax=None):
+def plot_map_thermal(map_thermal_view, map_blocks, hour, title="Thermal Map View", ax=None, viewport=None):
+    """
+    Plot the thermal view as a heatmap with the items on top in their thermal colors.
+
+    With a viewport (x0, y0, x1, y1), only that window of the thermal view is drawn, on the color scale of
+    the whole view, and only its blocks plus a margin of VIEWPORT_MARGIN blocks are visited.
+    """
     if ax is None:
-        fig, ax = plt.subplots(figsize=(10, 10))
+        with instrumentation.span("plot_map_thermal.figure"):
+            fig, ax = plt.subplots(figsize=(10, 10))
 
     thermal_cmap = plt.get_cmap('hot')  # Use a heatmap color scheme for thermal views
 
-    # Contrast factor simulates the effect of day/night on the thermal map
-    contrast_factor = np.sin(np.pi * hour / 24)
-
-    # Predefined colors for thermal views of different item types
-    default_colors = {
-        "Tree": (255, 165, 0),  # Orange
-        "House": (255, 255, 0),  # Yellow
-        "Animal": (255, 0, 0),   # Red
-        "Pond": (0, 0, 255),     # Blue
-        "Road": (128, 128, 128),  # Gray
-    }
-
     # Display the thermal data as an image
-    img = ax.imshow(map_thermal_view, cmap=thermal_cmap, extent=[0, map_thermal_view.shape[1], 0, map_thermal_view.shape[0]], origin='upper')
+    with instrumentation.span("plot_map_thermal.image"):
+        if viewport is None:
+            img = ax.imshow(map_thermal_view, cmap=thermal_cmap, extent=[0, map_thermal_view.shape[1], 0, map_thermal_view.shape[0]], origin='upper')
+        else:
+            n_rows = map_thermal_view.shape[0]
+            x0, y0, x1, y1 = viewport = _window(viewport, *map_thermal_view.shape)
+            img = ax.imshow(map_thermal_view[x0:x1, y0:y1], cmap=thermal_cmap, extent=[y0, y1, n_rows - x1, n_rows - x0],
+                            origin='upper', vmin=map_thermal_view.min(), vmax=map_thermal_view.max())
 
     # Plot different items with their respective thermal colors
-    for i, row in enumerate(map_blocks):
-        for j, block in enumerate(row):
+    cells = drawn = 0
+    with instrumentation.span("plot_map_thermal.patches"):
+        for i, j, block in _iter_blocks(map_blocks, viewport):
+            cells += 1
             for item in block.items:
-                # Get the item's base color from predefined mappings or default to white
-                base_color = np.array(default_colors.get(item.name, [255, 255, 255])) / 255.0
-
-                # Adjust brightness based on the contrast factor
-                adjusted_color = base_color * contrast_factor
-
-                # Ensure color values remain within the valid range (0-1)
-                adjusted_color = np.clip(adjusted_color, 0, 1)
-
-                # Override certain item types like water and roads to keep their fixed colors
-                if item.name == "Pond":
-                    color = normalize_color((0, 0, 255))  # Always blue for water
-                elif item.name == "Road":
-                    color = normalize_color((128, 128, 128))  # Always gray for roads
-                else:
-                    color = adjusted_color  # Use adjusted color for other items
-
-                # Plot different shapes based on the item type
-                if item.name == "Tree":
-                    circle = Circle((j + 0.5, map_thermal_view.shape[0] - i - 0.5), radius=item.radius, color=color)
-                    ax.add_patch(circle)
-                elif item.name == "House":
-                    rect = Rectangle((j, map_thermal_view.shape[0] - i - 1), item.width, item.length, color=color)
-                    ax.add_patch(rect)
-                elif item.name == "Road":
-                    rect = Rectangle((j - 0.5, map_thermal_view.shape[0] - i - 1.5), item.width, 1, color=color, alpha=0.8)
-                    ax.add_patch(rect)
-                elif item.name == "Pond":
-                    circle = Circle((j + 0.5, map_thermal_view.shape[0] - i - 0.5), radius=item.radius, color=color)
-                    ax.add_patch(circle)
-                elif item.name == "Animal":
-                    circle = Circle((j + 0.5, map_thermal_view.shape[0] - i - 0.5), radius=0.15, color=color)
-                    ax.add_patch(circle)
+                kwargs = {"alpha": ROAD_THERMAL_ALPHA} if item.name == "Road" else {}  # Roads are slightly see-through
+                patch = item_patch(item, i, j, map_thermal_view.shape[0], color=thermal_item_color(item.name, hour), **kwargs)
+                if patch is not None:
+                    ax.add_patch(patch)
+                    drawn += 1
+    instrumentation.count("cells_visited", cells)
+    instrumentation.count("items_drawn", drawn)
 
     # Configure the axis limits and grid settings
-    ax.set_xticks(np.arange(0, map_thermal_view.shape[1], step=5))
-    ax.set_yticks(np.arange(0, map_thermal_view.shape[0], step=5))
-    ax.set_xlim(0, map_thermal_view.shape[1])
-    ax.set_ylim(0, map_thermal_view.shape[0])
-    ax.set_aspect('equal')
-    ax.grid(False)
+    _configure_axes(ax, *map_thermal_view.shape, viewport=viewport)
     ax.set_title(f"{title} - Hour: {hour}")
-    plt.colorbar(img, ax=ax, label="Thermal Value (0 to 30)")  # Add colorbar to show thermal scale
+    with instrumentation.span("plot_map_thermal.colorbar"):
+        plt.colorbar(img, ax=ax, label="Thermal Value (0 to 30)")  # Add colorbar to show thermal scale
+
+
+class MapRenderer:
+    def __init__(self, simulation_map, axes=None, figsize=(12, 6), agents=None):
+        """
+        Reusable side-by-side RGB and thermal figure of a map.
+
+        The patches of each item type are built once into a single PatchCollection per view.
+        Drawing another hour only recolors those collections and swaps the thermal image data
+        in place, instead of creating a new figure, colorbar and one patch per item.
+
+        Args:
+            simulation_map (MapSimulation): The map to draw.
+            axes (tuple): Optional (rgb_ax, thermal_ax) pair to draw into; a new figure is created otherwise.
+            figsize (tuple): Size of the new figure when axes is not given.
+            agents (AnimalAgents): Optional moving animals, drawn where they are at every draw.
+        """
+        if axes is None:
+            self.fig, axes = plt.subplots(1, 2, figsize=figsize)
+        else:
+            self.fig = axes[0].figure
+        self.ax_rgb, self.ax_thermal = axes
+        n_rows, n_cols = simulation_map.height, simulation_map.width
+
+        # Group the patches of all items by type, drawn in DRAW_ORDER
+        patches = {name: [] for name in DRAW_ORDER}
+        cells, cell = 0, None
+        with instrumentation.span("renderer.patches"):
+            for i, j, item in simulation_map.iter_items():
+                if (i, j) != cell:
+                    cells, cell = cells + 1, (i, j)
+                patch = item_patch(item, i, j, n_rows)
+                if patch is not None:
+                    patches[item.name].append(patch)
+        patches = {name: item_patches for name, item_patches in patches.items() if item_patches}
+        instrumentation.count("cells_visited", cells)
+        instrumentation.count("items_drawn", sum(len(item_patches) for item_patches in patches.values()))
+
+        # RGB view: grass background with one collection per item type
+        with instrumentation.span("renderer.collections"):
+            self.ax_rgb.set_facecolor(normalize_color(GRASS_BACKGROUND))
+            self.rgb_collections = {name: self.ax_rgb.add_collection(PatchCollection(item_patches))
+                                    for name, item_patches in patches.items()}
+            _configure_axes(self.ax_rgb, n_rows, n_cols)
+
+            # Thermal view: heatmap image and one collection per item type on top
+            self.thermal_image = self.ax_thermal.imshow(np.zeros((n_rows, n_cols)), cmap=plt.get_cmap('hot'),
+                                                        extent=[0, n_cols, 0, n_rows], origin='upper')
+            self.thermal_collections = {}
+            for name, item_patches in patches.items():
+                alpha = ROAD_THERMAL_ALPHA if name == "Road" else None  # Roads are slightly see-through
+                self.thermal_collections[name] = self.ax_thermal.add_collection(PatchCollection(item_patches, alpha=alpha))
+            _configure_axes(self.ax_thermal, n_rows, n_cols)
+        with instrumentation.span("renderer.colorbar"):
+            self.colorbar = self.fig.colorbar(self.thermal_image, ax=self.ax_thermal, label="Thermal Value (0 to 30)")
+
+        # Moving animals: one collection per view, whose offsets are moved at every draw
+        self.agents = agents
+        self.agent_collections = []
+        if agents is not None:
+            for ax in (self.ax_rgb, self.ax_thermal):
+                collection = EllipseCollection(0.3, 0.3, 0, units='xy', offsets=np.empty((0, 2)),
+                                               offset_transform=ax.transData)  # Same size as Animal items
+                self.agent_collections.append(ax.add_collection(collection, autolim=False))
+
+    def draw_rgb(self, hour, title="RGB Map View"):
+        """Recolor the RGB view for the given hour."""
+        with instrumentation.span("renderer.draw_rgb"):
+            for name, collection in self.rgb_collections.items():
+                collection.set_color(rgb_item_color(name, hour))
+            self.ax_rgb.set_title(title)
+
+    def draw_thermal(self, map_thermal_view, hour, title="Thermal Map View"):
+        """Swap in a new thermal view and recolor the thermal items for the given hour."""
+        with instrumentation.span("renderer.draw_thermal"):
+            self.thermal_image.set_data(map_thermal_view)
+            self.thermal_image.set_clim(map_thermal_view.min(), map_thermal_view.max())  # Same autoscaling as imshow
+            for name, collection in self.thermal_collections.items():
+                collection.set_color(thermal_item_color(name, hour))
+            self.ax_thermal.set_title(f"{title} - Hour: {hour}")
+
+    def draw_agents(self, hour):
+        """Move the animal markers to the current positions of the agents."""
+        with instrumentation.span("renderer.draw_agents"):
+            positions = self.agents.positions
+            offsets = np.stack([positions[:, 1], self.thermal_image.get_extent()[3] - positions[:, 0]], axis=1)
+            for collection, color in zip(self.agent_collections, (rgb_item_color("Animal", hour),
+                                                                  thermal_item_color("Animal", hour))):
+                collection.set_offsets(offsets)
+                collection.set_color(color)
+            instrumentation.count("items_drawn", len(positions))
+
+    def draw(self, hour, temp, map_thermal_view):
+        """Update both views to show the given hour, as simulate_full_day does."""
+        self.fig.suptitle(f"Hour {hour}: RGB and Thermal Views")
+        self.draw_rgb(hour)
+        self.draw_thermal(map_thermal_view, temp)  # The thermal contrast follows the temperature
+        if self.agents is not None:
+            self.draw_agents(hour)
+
+
+class LODViewer:
+    def __init__(self, simulation_map, hour=12, temp=25.0, axes=None, figsize=(12, 6), pixels=None,
+                 detail_blocks=64 * 64, min_size=64):
+        """
+        Side-by-side RGB and thermal views of a large map that can be panned and zoomed interactively.
+
+        Every time the axis limits change, only the part of the map inside them is drawn, from the
+        coarsest level of the map's LODPyramid that still has a tile per screen pixel, so drawing costs
+        O(pixels on screen) whatever the number of items. Once the view is zoomed in to at most
+        detail_blocks blocks, the items inside it are drawn as shapes on top, as plot_map_rgb and
+        plot_map_thermal draw them.
+
+        Args:
+            simulation_map (MapSimulation): The map to draw.
+            hour (float): Hour of the day of the item colors.
+            temp (float): Temperature of the thermal view (the default is that of the example curve at noon).
+            axes (tuple): Optional (rgb_ax, thermal_ax) pair to draw into; a new figure is created otherwise.
+            figsize (tuple): Size of the new figure when axes is not given.
+            pixels (tuple): (rows, columns) of screen pixels per view used to pick the level (default is the
+                size of the axes on the canvas).
+            detail_blocks (int): Largest number of blocks in view for which items are drawn as shapes.
+            min_size (int): Side of the coarsest pyramid level, in tiles.
+        """
+        if axes is None:
+            self.fig, axes = plt.subplots(1, 2, figsize=figsize, sharex=True, sharey=True)
+        else:
+            self.fig = axes[0].figure
+        self.ax_rgb, self.ax_thermal = axes
+        self.map = simulation_map
+        self.pyramid = simulation_map.lod_pyramid(min_size)
+        self.pixels = pixels
+        self.detail_blocks = detail_blocks
+        self.level = None
+        self.viewport = None
+        self._collections = []
+        self._updating = False
+        n_rows, n_cols = simulation_map.height, simulation_map.width
+
+        # One image per view, whose data and extent are swapped for the level and window in view
+        conductivity = self.pyramid.levels[-1]["conductivity"]
+        self.rgb_image = self.ax_rgb.imshow(self.pyramid.rgb(len(self.pyramid) - 1), origin='upper',
+                                            extent=[0, n_cols, 0, n_rows], interpolation='nearest')
+        self.thermal_image = self.ax_thermal.imshow(conductivity, cmap=plt.get_cmap('hot'), origin='upper',
+                                                    extent=[0, n_cols, 0, n_rows], interpolation='nearest')
+        self.colorbar = self.fig.colorbar(self.thermal_image, ax=self.ax_thermal, label="Thermal Value (0 to 30)")
+        for ax in axes:
+            ax.set_facecolor(normalize_color(GRASS_BACKGROUND))
+            ax.set_autoscale_on(False)  # Swapping the image extent must not move the limits
+            _configure_axes(ax, n_rows, n_cols)
+        for ax in axes:
+            ax.callbacks.connect("xlim_changed", self._on_limits)
+            ax.callbacks.connect("ylim_changed", self._on_limits)
+        self.set_time(hour, temp)
+
+    def set_viewport(self, viewport):
+        """Show the blocks (x0, y0, x1, y1), as in blocks[x][y], of the map."""
+        _configure_axes(self.ax_rgb, self.map.height, self.map.width, viewport=viewport)
+        _configure_axes(self.ax_thermal, self.map.height, self.map.width, viewport=viewport)
+        self.update()
+
+    def set_time(self, hour, temp):
+        """Show the map at an hour of the day, with the thermal view at the temperature temp."""
+        self.hour = hour
+        self.temp = temp
+        # The color scale spans the whole map at this temperature, so that it does not change while panning
+        conductivity = self.map.mean_conductivity()
+        self.thermal_image.set_clim(self.temp * conductivity.min(), self.temp * conductivity.max())
+        self.ax_rgb.set_title("RGB Map View")
+        self.ax_thermal.set_title(f"Thermal Map View - Hour: {hour}")
+        self.level = None  # Redraw the current window
+        self.update()
+
+    def _on_limits(self, ax):
+        if not self._updating:
+            self.update()
+
+    def _viewport(self):
+        """Return the blocks (x0, y0, x1, y1) inside the current axis limits."""
+        n_rows = self.map.height
+        (left, right), (bottom, top) = sorted(self.ax_rgb.get_xlim()), sorted(self.ax_rgb.get_ylim())
+        viewport = (int(np.floor(n_rows - top)), int(np.floor(left)), int(np.ceil(n_rows - bottom)), int(np.ceil(right)))
+        return _window(viewport, n_rows, self.map.width)
+
+    def update(self):
+        """Redraw the part of the map inside the axis limits, if the window or its level changed."""
+        viewport = self._viewport()
+        pixels = self.pixels
+        if pixels is None:
+            box = self.ax_rgb.get_window_extent()
+            pixels = (box.height, box.width)
+        level = self.pyramid.level_for(viewport, pixels)
+        index, window = self.pyramid.crop(level, viewport)
+        if (level, window) == (self.level, self.viewport):
+            return
+        self.level, self.viewport = level, window
+
+        self._updating = True
+        try:
+            with instrumentation.span("lod_viewer.images", level=level):
+                n_rows = self.map.height
+                x0, y0, x1, y1 = window
+                extent = [y0, y1, n_rows - x1, n_rows - x0]
+                self.rgb_image.set_data(self.pyramid.levels[level]["rgb"][index])
+                self.rgb_image.set_extent(extent)
+                self.thermal_image.set_data(self.temp * self.pyramid.levels[level]["conductivity"][index])
+                self.thermal_image.set_extent(extent)
+                instrumentation.count("cells_visited", (index[0].stop - index[0].start) * (index[1].stop - index[1].start))
+            self._draw_items(level == 0 and (x1 - x0) * (y1 - y0) <= self.detail_blocks)
+        finally:
+            self._updating = False
+        self.fig.canvas.draw_idle()
+
+    def _draw_items(self, detail):
+        """Draw the items in the window as shapes when zoomed in far enough, and clear them otherwise."""
+        for collection in self._collections:
+            collection.remove()
+        self._collections = []
+        self.rgb_image.set_visible(not detail)  # In detail, the items are drawn on the grass background
+        if not detail:
+            return
+        with instrumentation.span("lod_viewer.items"):
+            n_rows = self.map.height
+            patches = {name: ([], []) for name in DRAW_ORDER}
+            window = _window(self.viewport, n_rows, self.map.width, VIEWPORT_MARGIN)
+            for i, j, item in self.map.iter_items(window):
+                rgb_patch = item_patch(item, i, j, n_rows)
+                if rgb_patch is not None:
+                    patches[item.name][0].append(rgb_patch)
+                    patches[item.name][1].append(item_patch(item, i, j, n_rows))
+            for name, (rgb_patches, thermal_patches) in patches.items():
+                if rgb_patches:
+                    instrumentation.count("items_drawn", len(rgb_patches))
+                    alpha = ROAD_THERMAL_ALPHA if name == "Road" else None  # Roads are slightly see-through
+                    rgb = PatchCollection(rgb_patches, color=rgb_item_color(name, self.hour))
+                    thermal = PatchCollection(thermal_patches, color=thermal_item_color(name, self.hour), alpha=alpha)
+                    self._collections += [self.ax_rgb.add_collection(rgb, autolim=False),
+                                          self.ax_thermal.add_collection(thermal, autolim=False)]